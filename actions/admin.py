@@ -1,6 +1,9 @@
+import csv
+import io
 import logging
-from pathlib import Path
+import sqlite3
 
+from discord import Attachment
 from discord import Colour
 from discord import Embed
 from discord import File
@@ -8,43 +11,214 @@ from discord import Interaction
 from discord import app_commands as commands
 from discord.ext.commands import Bot
 from discord.ext.commands import Cog
+from discord.utils import format_dt
+from sqlalchemy.exc import SQLAlchemyError
 
 from models.config import Configuration
+from services.export import ExportService
+from services.onboarding import ExportFormat
+from services.onboarding import OnboardingService
+from services.onboarding import dump_rows
+from services.onboarding import parse_rows
+from services.registry import SubscriptionRegistry
 
 logger = logging.getLogger(__name__)
 
+MAX_DESCRIPTION_CHARACTERS = 4096
+
 
 class AdminCog(Cog):
-    def __init__(self, bot: Bot, config: Configuration):
+    def __init__(
+        self,
+        bot: Bot,
+        config: Configuration,
+        export: ExportService,
+        onboarding: OnboardingService,
+        registry: SubscriptionRegistry,
+    ):
         self._config = config
         self._bot = bot
+        self._export_service = export
+        self._onboarding_service = onboarding
+        self._registry = registry
+
+    async def _authorize(self, interaction: Interaction) -> bool:
+        if interaction.user.name in self._config.discord_admin_users:
+            return True
+
+        await interaction.response.send_message(
+            embed=Embed(
+                title="Error",
+                description="You are not authorized to use this command.",
+                colour=Colour.red(),
+            ),
+            ephemeral=True,
+        )
+        return False
+
+    async def _follow_up(self, interaction: Interaction, embed: Embed):
+        # NOTE: A long import outlives the 15 minutes of the interaction token, its report
+        # then goes to the channel.
+        if not interaction.is_expired() or interaction.channel is None:
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        logger.info(f"[admin] Interaction of {interaction.user.name} expired, report in channel.")
+        await interaction.channel.send(interaction.user.mention, embed=embed)
 
     @commands.command(
         name="get-database",
-        description="Download SQLite database file.",
+        description="Download a compressed export of the SQLite database.",
     )
+    @commands.describe(incremental="Only export the rows changed since the last export.")
     async def get_database(
         self,
         interaction: Interaction,
+        incremental: bool = False,
     ):
         logger.info(f"[admin:get-database] {interaction.user.name} request database export.")
-        if interaction.user.name not in self._config.discord_admin_users:
+        if not await self._authorize(interaction):
+            return
+
+        if self._export_service.is_running:
+            await interaction.response.send_message(
+                embed=Embed(
+                    title="Error",
+                    description="Another export is still running, try again later.",
+                    colour=Colour.red(),
+                ),
+                ephemeral=True,
+            )
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            export = await self._export_service.export(incremental=incremental)
+        except (OSError, sqlite3.Error) as e:
+            logger.exception("[admin:get-database] Failure to export the database.")
+            await interaction.followup.send(
+                embed=Embed(
+                    title="Error",
+                    description=f"Failed to export the database: {e}",
+                    colour=Colour.red(),
+                ),
+                ephemeral=True,
+            )
+            return
+
+        try:
+            if export.incremental:
+                description = f"Rows changed since {format_dt(export.since)}, gzipped JSON lines."
+            else:
+                description = "A snapshot of the database for the bot, gzipped."
+            if len(export.parts) > 1:
+                description += f" Join the {len(export.parts)} parts with `cat` before unpacking."
+
+            await interaction.followup.send(
+                embed=Embed(
+                    title="Database",
+                    description=description,
+                    colour=Colour.green(),
+                ),
+                ephemeral=True,
+            )
+            # NOTE: Every part fills most of an upload on its own.
+            for path in export.parts:
+                await interaction.followup.send(file=File(path), ephemeral=True)
+            await self._export_service.commit(export)
+        finally:
+            await self._export_service.discard(export)
+
+    @commands.command(
+        name="import-subscriptions",
+        description="Subscribe every row of a CSV or JSON file at once.",
+    )
+    @commands.describe(
+        file=(
+            "Columns: username, channel_id, fetch_type, ignore_replies, ignore_retweets, filters."
+        )
+    )
+    async def import_subscriptions(
+        self,
+        interaction: Interaction,
+        file: Attachment,
+    ):
+        logger.info(
+            f"[admin:import-subscriptions] {interaction.user.name} request import {file.filename}."
+        )
+        if not await self._authorize(interaction):
+            return
+
+        try:
+            rows = parse_rows(await file.read(), file.filename)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
             await interaction.response.send_message(
                 embed=Embed(
                     title="Error",
-                    description="You are not authorized to use this command.",
+                    description=f"Failed to read {file.filename}: {e}",
                     colour=Colour.red(),
                 ),
                 ephemeral=True,
             )
             return
 
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            report = await self._onboarding_service.import_rows(rows, self._bot.get_channel)
+        except SQLAlchemyError:
+            logger.exception("[admin:import-subscriptions] Failure to import the subscriptions.")
+            await self._follow_up(
+                interaction,
+                Embed(
+                    title="Error",
+                    description=f"Failed to save the subscriptions of {file.filename}.",
+                    colour=Colour.red(),
+                ),
+            )
+            return
+
+        skipped = [
+            f" - @{row.username} in {row.channel_id}: {reason}" for row, reason in report.skipped
+        ]
+        description = f"{len(report.added)} subscriptions added, {len(report.skipped)} skipped."
+        if len(skipped) != 0:
+            description = f"{description}\n{'\n'.join(skipped)}"[:MAX_DESCRIPTION_CHARACTERS]
+
+        await self._follow_up(
+            interaction,
+            Embed(
+                title="Import",
+                description=description,
+                colour=Colour.green() if len(report.added) != 0 else Colour.orange(),
+            ),
+        )
+
+    @commands.command(
+        name="export-subscriptions",
+        description="Download every subscription as a CSV or JSON file.",
+    )
+    @commands.choices(
+        format=[
+            commands.Choice(name="CSV", value="csv"),
+            commands.Choice(name="JSON", value="json"),
+        ],
+    )
+    async def export_subscriptions(
+        self,
+        interaction: Interaction,
+        format: ExportFormat = "csv",
+    ):
+        logger.info(f"[admin:export-subscriptions] {interaction.user.name} request {format}.")
+        if not await self._authorize(interaction):
+            return
+
+        subscriptions = self._registry.all()
         await interaction.response.send_message(
             embed=Embed(
-                title="Database",
-                description="This is the database for the bot.",
+                title="Subscriptions",
+                description=f"{len(subscriptions)} subscriptions, ready for import-subscriptions.",
                 colour=Colour.green(),
             ),
-            file=File(Path(self._config.database_path) / "tracker.db"),
+            file=File(io.BytesIO(dump_rows(subscriptions, format)), f"subscriptions.{format}"),
             ephemeral=True,
         )
@@ -0,0 +1,89 @@
+from collections.abc import Callable
+from typing import TypeAlias
+from uuid import UUID
+
+from discord import ButtonStyle
+from discord import Colour
+from discord import Embed
+from discord import Interaction
+from discord import ui
+from pendulum import DateTime
+
+from models.config import Configuration
+from models.database import Subscription
+from services.database import DatabaseService
+
+PAGE_SIZE = 10
+MAX_DESCRIPTION_CHARACTERS = 4096
+VIEW_TIMEOUT = 600
+
+PageKey: TypeAlias = tuple[str, str, UUID]
+Describe: TypeAlias = Callable[[Subscription], str]
+
+
+class SubscriptionListView(ui.View):
+    """
+    Pages through the subscriptions of a guild or channel with keyset pagination. Every
+    visited page keeps the key it starts after, the last row of the page before it, so going
+    back is one query too.
+    """
+
+    _starts: list[PageKey | None]
+
+    def __init__(
+        self,
+        config: Configuration,
+        db: DatabaseService,
+        title: str,
+        describe: Describe,
+        guild_id: str | None = None,
+        channel_id: str | None = None,
+    ) -> None:
+        super().__init__(timeout=VIEW_TIMEOUT)
+        self._config = config
+        self._db_service = db
+        self._title = title
+        self._describe = describe
+        self._guild_id = guild_id
+        self._channel_id = channel_id
+        self._starts = [None]
+        self._next: PageKey | None = None
+        self._total = 0
+
+    async def render(self) -> Embed:
+        # NOTE: One extra row tells whether there is a next page.
+        page = await self._db_service.subscriptions_page(
+            PAGE_SIZE + 1, self._starts[-1], self._guild_id, self._channel_id
+        )
+        self._total = await self._db_service.count_subscriptions(self._guild_id, self._channel_id)
+        self._next = None
+        if len(page) > PAGE_SIZE:
+            page = page[:PAGE_SIZE]
+            self._next = (page[-1].channel_id, page[-1].username, page[-1].id)
+
+        self.previous.disabled = len(self._starts) == 1
+        self.next.disabled = self._next is None
+
+        pages = max(-(-self._total // PAGE_SIZE), 1)
+        lines = [f"There are {self._total} registered subscriptions."]
+        lines.extend(self._describe(item) for item in page)
+        return Embed(
+            title=self._title,
+            description="\n".join(lines)[:MAX_DESCRIPTION_CHARACTERS],
+            colour=Colour.blue(),
+            timestamp=DateTime.now(self._config.timezone_text),
+        ).set_footer(text=f"Page {len(self._starts)}/{pages}")
+
+    @ui.button(label="Previous", style=ButtonStyle.secondary)
+    async def previous(self, interaction: Interaction, _button: ui.Button):
+        if len(self._starts) > 1:
+            self._starts.pop()
+
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @ui.button(label="Next", style=ButtonStyle.secondary)
+    async def next(self, interaction: Interaction, _button: ui.Button):
+        if self._next is not None:
+            self._starts.append(self._next)
+
+        await interaction.response.edit_message(embed=await self.render(), view=self)
@@ -1,34 +1,59 @@
 import logging
-import re
-from math import ceil
+from contextlib import aclosing
+from dataclasses import dataclass
+from datetime import datetime
 from uuid import UUID
 
-import aiocron
 from discord import Colour
 from discord import Embed
 from discord import Interaction
 from discord import TextChannel
 from discord import app_commands as commands
-from discord.errors import DiscordException
 from discord.ext.commands import Bot
 from discord.ext.commands import Cog
 from pendulum import DateTime
-from sqlalchemy.exc import NoResultFound
-from twikit import Tweet
 
-from exceptions import SubscriptionNotFoundError
+from actions.listing import SubscriptionListView
+from exceptions import RateLimitExceededError
+from exceptions import WorkerLostError
 from models.base import FetchType
 from models.config import Configuration
+from models.database import OutboxEntry
 from models.database import Subscription
+from models.database import XUser
+from models.tweet import TweetRecord
+from services.cache import TweetCache
+from services.catchup import Backlog
+from services.cursors import CursorStore
 from services.database import DatabaseService
+from services.delivery import DeliveryService
+from services.filters import compile_matcher
+from services.filters import dump_filters
+from services.filters import make_rules
+from services.filters import split_list
+from services.filters import subscription_rules
+from services.metrics import histogram
+from services.outbox import OutboxService
+from services.outbox import make_entry
+from services.pipeline import Pipeline
+from services.registry import RegistryEvent
+from services.registry import SubscriptionRegistry
+from services.renderer import Renderer
+from services.scheduler import PollKey
+from services.scheduler import PollScheduler
+from services.scheduler import make_poll_key
+from services.shard import ShardCoordinator
 from services.x import XService
 
 logger = logging.getLogger(__name__)
 
+POLL_FETCH_SECONDS = histogram("poll_fetch_seconds", "Duration of the fetch stage of a poll.")
+
 
 def get_description(subscription: Subscription, channel: str | None = None) -> str:
     reply = "Ignore Replies" if subscription.ignore_replies else "Including Replies"
     retweet = "Ignore Retweets" if subscription.ignore_retweets else "Including Retweets"
+    filters = ", Filtered" if subscription.filters is not None else ""
     channel = (
         f"https://discord.com/channels/{subscription.guild_id}/{subscription.channel_id} -"
         if channel is not None
@@ -37,180 +62,371 @@ def get_description(subscription: Subscription, channel: str | None = None) -> s
 
     return (
         f" - Subscribing [@{subscription.username}](https://x.com/{subscription.username})'s "
-        f"{subscription.fetch_type} Tab into {channel} ({reply}, {retweet})"
+        f"{subscription.fetch_type} Tab into {channel} ({reply}, {retweet}{filters})"
     )
 
 
-def get_url(tweet: Tweet) -> str:
-    target_tweet = tweet.retweeted_tweet if tweet.retweeted_tweet is not None else tweet
-    return f"https://x.com/{target_tweet.user.screen_name}/{target_tweet.id}"
-
-
-def make_embed(tweet: Tweet) -> Embed:
-    tweet_text = tweet.full_text
-    action_type = "Tweet"
-
-    if tweet.retweeted_tweet is not None:
-        action_type = "Retweet"
-    if tweet.quote is not None:
-        action_type = "Quote"
-        tweet_text = (
-            f"{tweet.full_text}\n\nRT @{tweet.quote.user.screen_name}: {tweet.quote.full_text}"
-        )
+async def collect_backlogs(
+    x: XService, config: Configuration, subscriptions: list[Subscription]
+) -> tuple[list[Backlog], TweetRecord | None, list[float]]:
+    """
+    Fetches the shared timeline once from the oldest cursor and feeds it page by page into
+    one backlog per subscription. Pages come newest first, so nothing is rendered before the
+    paging stops, but only the capped backlogs are held. Returns the backlogs, the newest
+    tweet, and the creation times of every tweet that was seen.
+    """
+    last_ids = [item.last_tweet_id for item in subscriptions if item.last_tweet_id]
+    last_times = [item.last_tweeted_at for item in subscriptions if item.last_tweeted_at]
+    backlogs = [Backlog(item, config.catchup_max_backlog) for item in subscriptions]
+    matcher = compile_matcher(tuple(subscription_rules(item) for item in subscriptions))
+    latest: TweetRecord | None = None
+    times: list[float] = []
+    stream = x.stream_tweets(
+        subscriptions[0].username,
+        subscriptions[0].fetch_type,
+        last_id=min(last_ids, key=int) if len(last_ids) != 0 else None,
+        last_time=min(last_times) if len(last_times) != 0 else None,
+    )
+    with POLL_FETCH_SECONDS.time():
+        async with aclosing(stream):
+            async for page in stream:
+                if latest is None or int(page[0].id) > int(latest.id):
+                    latest = page[0]
+                times.extend(tweet.created_at.timestamp() for tweet in page)
+                for backlog, accepted in zip(backlogs, matcher.scan(page), strict=True):
+                    backlog.offer(page, accepted)
+
+                # NOTE: Stop paging once every backlog is full, older tweets are skipped.
+                if all(backlog.done for backlog in backlogs):
+                    break
+            else:
+                for backlog in backlogs:
+                    backlog.complete = True
+
+    return backlogs, latest, times
+
+
+def render_entries(
+    cache: TweetCache, renderer: Renderer, backlog: Backlog, summarize: bool
+) -> list[OutboxEntry]:
+    subscription = backlog.subscription
+    tweets = backlog.tweets
+    profile = renderer.profile(subscription.channel_id)
+    entries = []
+    summary = backlog.summary()
+    if summary is not None:
+        logger.info(f"[{subscription.id}] Catching up: {summary}")
+        if summarize and len(tweets) != 0:
+            entries.append(
+                make_entry(
+                    subscription.id,
+                    subscription.channel_id,
+                    subscription.username,
+                    f"{tweets[-1].id}:skipped",
+                    [profile.summary(subscription.username, summary)],
+                )
+            )
 
-    embed = (
-        Embed(
-            title=f"New {action_type} from @{tweet.user.screen_name}",
-            description=tweet_text,
-            url=get_url(tweet),
-            color=0x1DA0F2,
-            timestamp=tweet.created_at_datetime,
-        )
-        .set_author(
-            name=f"{tweet.user.name} (@{tweet.user.screen_name})",
-            icon_url=tweet.user.profile_image_url,
-            url=f"https://x.com/{tweet.user.screen_name}",
+    # NOTE: The backlog is newest first, the outbox delivers in insertion order.
+    ordered = tweets[::-1]
+    entries.extend(
+        make_entry(subscription.id, subscription.channel_id, tweet.screen_name, tweet.id, embeds)
+        for tweet, embeds in zip(
+            ordered, cache.embeds(ordered, profile.name, profile.render_many), strict=True
         )
-        .set_thumbnail(url=re.sub(r"normal(?=\.jpg$)", "400x400", tweet.user.profile_image_url))
     )
+    return entries
 
-    if len(tweet.media) >= 1:
-        return embed.set_image(url=tweet.media[0].media_url)
 
-    return embed
+@dataclass(slots=True)
+class RenderJob:
+    backlog: Backlog
+    latest: TweetRecord
+    activity_gap: float | None = None
 
 
-class SubscribeCog(Cog):
-    _subscriptions: dict[UUID, aiocron.Cron]
+@dataclass(slots=True)
+class DeliveryJob:
+    subscription: Subscription
+    entries: list[OutboxEntry]
+    last_tweet_id: str
+    last_tweeted_at: datetime
+    activity_gap: float | None = None
 
-    def __init__(self, bot: Bot, config: Configuration, x: XService, db: DatabaseService):
-        self._subscriptions = {}
 
+class SubscribeCog(Cog):
+    def __init__(
+        self,
+        bot: Bot,
+        config: Configuration,
+        x: XService,
+        db: DatabaseService,
+        registry: SubscriptionRegistry,
+        cursors: CursorStore,
+        delivery: DeliveryService,
+        outbox: OutboxService,
+        cache: TweetCache,
+        shard: ShardCoordinator | None = None,
+    ):
         self._config = config
         self._bot = bot
         self._x_service = x
         self._db_service = db
+        self._registry = registry
+        self._registry.listen(self.on_registry_change)
+        self._cursors = cursors
+        self._delivery_service = delivery
+        self._outbox_service = outbox
+        self._tweet_cache = cache
+        self._shard = shard
+        self._renderer = Renderer(config)
+        self._scheduler = PollScheduler(config, self.on_poll)
+
+        self._pipeline = Pipeline()
+        if shard is None:
+            self._pipeline.add_stage(
+                "fetch",
+                self.on_fetch,
+                concurrency=config.fetch_concurrency,
+                timeout=config.fetch_timeout,
+                queue_size=config.pipeline_queue_size,
+            )
+            self._pipeline.add_stage(
+                "render",
+                self.on_render,
+                timeout=config.render_timeout,
+                queue_size=config.pipeline_queue_size,
+            )
+        else:
+            # NOTE: Worker processes fetch and render, this process only keeps the cursors.
+            self._pipeline.add_stage(
+                "fetch",
+                self.on_remote_fetch,
+                concurrency=config.fetch_concurrency * config.shard_workers,
+                timeout=config.fetch_timeout + config.render_timeout,
+                queue_size=config.pipeline_queue_size,
+            )
+        self._pipeline.add_stage(
+            "send",
+            self.on_send,
+            concurrency=config.send_concurrency,
+            timeout=config.send_timeout,
+            queue_size=config.pipeline_queue_size,
+        )
 
     async def initialize(self):
-        subscriptions = await self._db_service.subscriptions()
-        for item in subscriptions:
-            self.subscribe_item(item.id)
-
-    def subscribe_item(self, subscription_id: UUID):
-        if subscription_id not in self._subscriptions:
-            self._subscriptions[subscription_id] = aiocron.crontab(
-                f"*/{self._config.fetch_interval} * * * *",
-                self.on_subscribe,
-                kwargs={
-                    "subscription_id": subscription_id,
-                },
+        if self._shard is not None:
+            await self._shard.start()
+        self._x_service.start()
+        self._cursors.start()
+        self._outbox_service.start()
+        self._pipeline.start()
+        await self._registry.load()
+
+    async def cog_unload(self):
+        self._scheduler.stop()
+        await self._pipeline.stop()
+        if self._shard is not None:
+            await self._shard.stop()
+        await self._x_service.stop()
+        await self._cursors.close()
+        await self._outbox_service.stop()
+        await self._delivery_service.stop()
+
+    def is_busy(self, key: PollKey) -> bool:
+        return self._pipeline.is_busy(key)
+
+    def on_registry_change(self, event: RegistryEvent, subscription: Subscription):
+        if event == "added":
+            last_tweeted_at = subscription.last_tweeted_at
+            self._scheduler.add(
+                subscription.id,
+                subscription.username,
+                subscription.fetch_type,
+                gap=subscription.activity_gap,
+                last_seen=last_tweeted_at.timestamp() if last_tweeted_at is not None else None,
             )
+        else:
+            self._scheduler.remove(subscription.id)
 
-    def unsubscribe_item(self, subscription_id: UUID):
-        if subscription_id not in self._subscriptions:
-            raise SubscriptionNotFoundError
-
-        self._subscriptions[subscription_id].stop()
-        self._subscriptions[subscription_id] = None
-
-    async def on_subscribe(self, subscription_id: UUID):
-        logger.info(f"[{subscription_id}] On subscribe")
-        async with self._db_service.session() as session:
-            try:
-                subscription = await session.get_one(Subscription, subscription_id)
-                channel_id = subscription.channel_id
-                channel = self._bot.get_channel(int(channel_id))
-                if channel is None:
-                    logger.warn(f"[{subscription_id}] Failure to find channel: {channel_id}")
-                    return
-
-                ignore_replies = subscription.ignore_replies
-                ignore_retweets = subscription.ignore_retweets
-                logger.info(
-                    f"[{subscription_id}] Subscription resolved: {channel.name} "
-                    f"- ignore_replies: {ignore_replies}, ignore_retweets: {ignore_retweets}"
-                )
+    async def unsubscribe_item(self, subscription_id: UUID):
+        await self._registry.remove(subscription_id)
 
-                previous_latest_tweet_id = subscription.last_tweet_id
-                tweets = await self._x_service.fetch_tweets(
-                    subscription.username,
-                    subscription.fetch_type,
-                    last_id=subscription.last_tweet_id,
-                    last_time=subscription.last_tweeted_at,
-                )
+    async def on_poll(self, key: PollKey, subscription_ids: frozenset[UUID]):
+        if self.is_busy(key):
+            logger.warning(f"[Poll:@{key[0]}] Previous poll is still in progress, skipping.")
+            return
+
+        logger.info(f"[Poll:@{key[0]}] On poll - {len(subscription_ids)} subscriptions")
+        await self._pipeline.submit(key, (key, subscription_ids))
+
+    def _resolve(self, subscription_ids: frozenset[UUID]) -> list[Subscription]:
+        return [
+            subscription
+            for subscription_id in subscription_ids
+            if (subscription := self._registry.get(subscription_id)) is not None
+        ]
 
-                if len(tweets) == 0:
-                    return
+    async def on_fetch(self, item: tuple[PollKey, frozenset[UUID]]) -> list[RenderJob] | None:
+        key, subscription_ids = item
+        subscriptions = self._resolve(subscription_ids)
+        if len(subscriptions) == 0:
+            return None
 
-                subscription.last_tweet_id = tweets[0].id
-                subscription.last_tweeted_at = tweets[0].created_at_datetime
-                session.add(subscription)
+        # NOTE: Fetch once from the oldest cursor, every subscription picks its own part.
+        try:
+            backlogs, latest, times = await collect_backlogs(
+                self._x_service, self._config, subscriptions
+            )
+        except RateLimitExceededError as e:
+            logger.warning(f"[Poll:@{key[0]}] Skipping this tick: {e}")
+            return None
 
-                if previous_latest_tweet_id is None:
-                    return
+        if latest is None:
+            return None
 
-                tweets = self._x_service.filter(
-                    tweets, ignore_replies=ignore_replies, ignore_retweets=ignore_retweets
+        activity_gap = self._scheduler.observe(
+            key, times, continuous=all(backlog.complete for backlog in backlogs)
+        )
+        return [
+            RenderJob(backlog=backlog, latest=latest, activity_gap=activity_gap)
+            for backlog in backlogs
+        ]
+
+    async def on_remote_fetch(
+        self, item: tuple[PollKey, frozenset[UUID]]
+    ) -> list[DeliveryJob] | None:
+        key, subscription_ids = item
+        subscriptions = []
+        for subscription in self._resolve(subscription_ids):
+            if self._bot.get_channel(int(subscription.channel_id)) is None:
+                logger.warning(
+                    f"[{subscription.id}] Failure to find channel: {subscription.channel_id}"
                 )
+                continue
+            subscriptions.append(subscription)
 
-                text = f"{len(tweets)} New Activities from @{tweets[0].user.screen_name}"
-                embeds = [make_embed(tweet) for tweet in tweets]
+        if len(subscriptions) == 0:
+            return None
 
-                if len(tweets) <= 10:
-                    if len(tweets) == 1:
-                        text = f"New Activity from @{tweets[0].user.screen_name}"
+        try:
+            result = await self._shard.request(
+                key[0], {"subscriptions": [s.model_dump(mode="json") for s in subscriptions]}
+            )
+        except WorkerLostError as e:
+            logger.warning(f"[Poll:@{key[0]}] Skipping this tick: {e}")
+            return None
+
+        # NOTE: Workers only read the database, the users they fetched are saved here.
+        if len(result.get("users") or []) != 0:
+            await self._db_service.save_cached_users(
+                [XUser.model_validate(item) for item in result["users"]]
+            )
 
-                    await channel.send(text, embeds=embeds)
-                    await session.commit()
-                    return
+        if result.get("error") is not None:
+            logger.warning(f"[Poll:@{key[0]}] Skipping this tick: {result['error']}")
+            return None
+        if result["latest"] is None:
+            return None
+
+        activity_gap = self._scheduler.observe(key, result["times"], result["continuous"])
+        deliveries = []
+        for delivery in result["deliveries"]:
+            subscription = self._registry.get(UUID(delivery["subscription_id"]))
+            if subscription is None:
+                continue
+
+            deliveries.append(
+                DeliveryJob(
+                    subscription=subscription,
+                    entries=[
+                        OutboxEntry(subscription_id=subscription.id, **entry)
+                        for entry in delivery["entries"]
+                    ],
+                    last_tweet_id=result["latest"]["id"],
+                    last_tweeted_at=datetime.fromisoformat(result["latest"]["created_at"]),
+                    activity_gap=activity_gap,
+                )
+            )
 
-                # NOTE(Haze): Don't use asyncio.gather, it requires to executed sequentially.
-                max_pages = ceil(len(tweets) / 10)
-                for idx in range(max_pages):
-                    paged_text = f"{text}\nPage {idx + 1}/{max_pages}"
-                    await channel.send(paged_text, embeds=embeds[idx * 10 : (idx + 1) * 10])
+        return deliveries
+
+    async def on_render(self, job: RenderJob) -> list[DeliveryJob] | None:
+        subscription = job.backlog.subscription
+        channel_id = subscription.channel_id
+        channel = self._bot.get_channel(int(channel_id))
+        if channel is None:
+            logger.warning(f"[{subscription.id}] Failure to find channel: {channel_id}")
+            return None
+
+        ignore_replies = subscription.ignore_replies
+        ignore_retweets = subscription.ignore_retweets
+        logger.info(
+            f"[{subscription.id}] Subscription resolved: {channel.name} "
+            f"- ignore_replies: {ignore_replies}, ignore_retweets: {ignore_retweets}"
+        )
 
-                await session.commit()
-            except NoResultFound:
-                if (job := self._subscriptions.get(subscription_id, None)) is not None:
-                    job.stop()
-                    self._subscriptions[subscription_id] = None
-            except DiscordException:
-                await session.rollback()
+        delivery = DeliveryJob(
+            subscription=subscription,
+            entries=render_entries(
+                self._tweet_cache, self._renderer, job.backlog, self._config.catchup_summary
+            ),
+            last_tweet_id=job.latest.id,
+            last_tweeted_at=job.latest.created_at,
+            activity_gap=job.activity_gap,
+        )
+        return [delivery]
+
+    async def on_send(self, job: DeliveryJob) -> None:
+        # NOTE: The outbox entries are written in the same transaction as the cursor.
+        self._registry.advance(
+            job.subscription.id,
+            job.last_tweet_id,
+            job.last_tweeted_at,
+            entries=job.entries,
+            activity_gap=job.activity_gap,
+        )
 
     @commands.command(
         name="list",
-        description="Retreive list of subscriptions. (For all subscriptions or specific channel.)",
+        description="Retreive list of subscriptions. (For this server or specific channel.)",
     )
     async def list(
         self,
         interaction: Interaction,
         channel: TextChannel | None = None,
     ):
-        channel_name = (
-            "Total"
-            if channel is None
-            else f"https://discord.com/channels/{channel.guild.id}/{channel.id}"
-        )
-        subscriptions = await self._db_service.subscriptions(
-            channel_id=channel.id if channel is not None else None
-        )
-        channels = [
-            get_description(
-                item, self._bot.get_channel(int(item.channel_id)) if channel is None else None
+        guild_id = str(interaction.guild_id) if interaction.guild_id is not None else None
+        if channel is not None:
+            guild_id = str(channel.guild.id)
+            channel_name = f"https://discord.com/channels/{channel.guild.id}/{channel.id}"
+        elif guild_id is not None:
+            channel_name = interaction.guild.name
+        elif interaction.user.name in self._config.discord_admin_users:
+            channel_name = "Total"
+        else:
+            await interaction.response.send_message(
+                embed=Embed(
+                    title="Error",
+                    description="Use this command in a server, or pick a channel.",
+                    colour=Colour.red(),
+                ),
+                ephemeral=True,
             )
-            for item in subscriptions
-        ]
+            return
 
-        content = f"There are {len(subscriptions)} registered subscriptions.\n{'\n'.join(channels)}"
-        await interaction.response.send_message(
-            embed=Embed(
-                title=f"Subscriptions ({channel_name})",
-                description=content,
-                colour=Colour.blue(),
-                timestamp=DateTime.now(self._config.timezone_text),
+        view = SubscriptionListView(
+            self._config,
+            self._db_service,
+            title=f"Subscriptions ({channel_name})",
+            describe=lambda item: get_description(
+                item, self._bot.get_channel(int(item.channel_id)) if channel is None else None
             ),
-            ephemeral=True,
+            guild_id=guild_id,
+            channel_id=str(channel.id) if channel is not None else None,
+        )
+        await interaction.response.send_message(
+            embed=await view.render(), view=view, ephemeral=True
         )
 
     @commands.command(
@@ -224,6 +440,17 @@ class SubscribeCog(Cog):
             commands.Choice(name="Media Tab", value="Media"),
         ],
     )
+    @commands.describe(
+        keywords="Only post tweets containing one of these comma-separated texts, even mid-word.",
+        exclude_keywords="Never post tweets containing one of these comma-separated texts.",
+        hashtags="Only post tweets with one of these comma-separated hashtags.",
+        exclude_hashtags="Never post tweets with one of these comma-separated hashtags.",
+        pattern="Only post tweets matching this regular expression. (Admins only.)",
+        exclude_pattern="Never post tweets matching this regular expression. (Admins only.)",
+        languages="Only post tweets in these comma-separated language codes, like en,ja.",
+        exclude_languages="Never post tweets in these comma-separated language codes.",
+        media_only="Only post tweets with images or videos.",
+    )
     @commands.rename(fetch="type")
     async def subscribe(
         self,
@@ -233,7 +460,58 @@ class SubscribeCog(Cog):
         fetch: FetchType = "Tweets",
         ignore_replies: bool = False,
         ignore_retweets: bool = False,
+        keywords: str | None = None,
+        exclude_keywords: str | None = None,
+        hashtags: str | None = None,
+        exclude_hashtags: str | None = None,
+        pattern: str | None = None,
+        exclude_pattern: str | None = None,
+        languages: str | None = None,
+        exclude_languages: str | None = None,
+        media_only: bool = False,
     ):
+        if (pattern or exclude_pattern) and (
+            interaction.user.name not in self._config.discord_admin_users
+        ):
+            await interaction.response.send_message(
+                embed=Embed(
+                    title="Failure",
+                    description="Only administrators can filter with regular expressions.",
+                    colour=Colour.red(),
+                    timestamp=DateTime.now(self._config.timezone_text),
+                ),
+                ephemeral=True,
+            )
+            return
+
+        try:
+            filters = dump_filters(
+                make_rules(
+                    {
+                        "keywords": split_list(keywords),
+                        "exclude_keywords": split_list(exclude_keywords),
+                        "hashtags": split_list(hashtags),
+                        "exclude_hashtags": split_list(exclude_hashtags),
+                        "patterns": [pattern] if pattern else [],
+                        "exclude_patterns": [exclude_pattern] if exclude_pattern else [],
+                        "languages": split_list(languages),
+                        "exclude_languages": split_list(exclude_languages),
+                        "media_only": media_only,
+                    }
+                )
+            )
+        except ValueError as e:
+            await interaction.response.send_message(
+                embed=Embed(
+                    title="Failure",
+                    description=str(e),
+                    colour=Colour.red(),
+                    timestamp=DateTime.now(self._config.timezone_text),
+                ),
+                ephemeral=True,
+            )
+            return
+
         user = await self._x_service.check_user_exists(username)
         if user is None:
             await interaction.response.send_message(
@@ -247,21 +525,24 @@ class SubscribeCog(Cog):
             )
             return
 
-        async with self._db_service.session() as session:
+        # NOTE: A timeline polled within the fetch interval seeds from its newest cached tweet.
+        latest = self._tweet_cache.latest(make_poll_key(username, fetch))
+        if latest is None:
             tweets = await self._x_service.fetch_tweets(username, fetch)
-            subscription = Subscription(
-                username=username,
-                channel_id=channel.id,
-                guild_id=channel.guild.id,
-                fetch_type=fetch,
-                ignore_replies=ignore_replies,
-                ignore_retweets=ignore_retweets,
-                last_tweet_id=tweets[0].id if len(tweets) != 0 else None,
-                last_tweeted_at=tweets[0].created_at_datetime if len(tweets) != 0 else None,
-            )
-            session.add(subscription)
-            self.subscribe_item(subscription.id)
-            await session.commit()
+            latest = tweets[0] if len(tweets) != 0 else None
+
+        subscription = Subscription(
+            username=username,
+            channel_id=channel.id,
+            guild_id=channel.guild.id,
+            fetch_type=fetch,
+            ignore_replies=ignore_replies,
+            ignore_retweets=ignore_retweets,
+            filters=filters,
+            last_tweet_id=latest.id if latest is not None else None,
+            last_tweeted_at=latest.created_at if latest is not None else None,
+        )
+        await self._registry.add(subscription)
 
         await interaction.response.send_message(
             embed=Embed(
@@ -0,0 +1,211 @@
+import asyncio
+import random
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import UTC
+from datetime import datetime
+from time import perf_counter
+from time import time
+from types import SimpleNamespace
+
+from discord import Embed
+from twikit import TooManyRequests
+
+from services.timeline import TWITTER_EPOCH_MS
+
+
+def make_snowflake(timestamp: float, sequence: int) -> int:
+    return ((int(timestamp * 1000) - TWITTER_EPOCH_MS) << 22) | (sequence & 0xFFF)
+
+
+@dataclass(slots=True)
+class FakeUser:
+    id: str
+    screen_name: str
+    name: str
+    profile_image_url: str
+
+
+class FakePage(list):
+    next_cursor: str | None = None
+
+
+@dataclass(slots=True)
+class FakeTimeline:
+    user: FakeUser
+    rate: float
+    tweets: list[SimpleNamespace] = field(default_factory=list)
+    sequence: int = 0
+
+
+class FakeTimelines:
+    """
+    Synthetic timelines on a virtual clock. Every account posts as a Poisson process of its
+    own rate, and the wall-clock moment a tweet was published is kept for latency numbers.
+    """
+
+    def __init__(self, usernames: list[str], rate: float, seed: int = 0, history: int = 2000):
+        self.now = time()
+        self.history = history
+        self.published: dict[str, float] = {}
+        self._random = random.Random(seed)
+        self._timelines: dict[str, FakeTimeline] = {}
+        for idx, username in enumerate(usernames):
+            user = FakeUser(
+                id=str(1000 + idx),
+                screen_name=username,
+                name=username.title(),
+                profile_image_url=f"https://pbs.twimg.com/profile_images/{idx}/a_normal.jpg",
+            )
+            # NOTE: Rates are spread around the mean, so that quiet and busy accounts mix.
+            self._timelines[user.id] = FakeTimeline(user, rate * self._random.uniform(0.1, 1.9))
+            self._timelines[username.lower()] = self._timelines[user.id]
+
+    def user(self, username: str) -> FakeUser:
+        return self._timelines[username.lower()].user
+
+    def timeline(self, user_id: str) -> list[SimpleNamespace]:
+        return self._timelines[user_id].tweets
+
+    def sequence(self, username: str) -> int:
+        """How many tweets the account has posted so far."""
+        return self._timelines[username.lower()].sequence
+
+    def seed(self):
+        """Posts a tweet on every empty timeline, so that every subscription has a cursor."""
+        for key, timeline in self._timelines.items():
+            if key == timeline.user.id and len(timeline.tweets) == 0:
+                timeline.sequence += 1
+                timeline.tweets.append(self._make_tweet(timeline, self.now))
+
+    def advance(self, seconds: float) -> int:
+        """Moves the virtual clock forward and returns how many tweets were posted."""
+        published_at = perf_counter()
+        posted = 0
+        for key, timeline in self._timelines.items():
+            if key != timeline.user.id or timeline.rate <= 0:
+                continue
+
+            moment = self.now + self._random.expovariate(timeline.rate)
+            while moment < self.now + seconds:
+                timeline.sequence += 1
+                tweet = self._make_tweet(timeline, moment)
+                timeline.tweets.append(tweet)
+                self.published[tweet.id] = published_at
+                posted += 1
+                moment += self._random.expovariate(timeline.rate)
+
+            del timeline.tweets[: -self.history]
+
+        self.now += seconds
+        return posted
+
+    def _make_tweet(self, timeline: FakeTimeline, moment: float) -> SimpleNamespace:
+        tweet_id = str(make_snowflake(moment, timeline.sequence))
+        has_media = timeline.sequence % 4 == 0
+        return SimpleNamespace(
+            id=tweet_id,
+            created_at_datetime=datetime.fromtimestamp(moment, UTC),
+            full_text=f"Synthetic tweet {timeline.sequence} from @{timeline.user.screen_name}",
+            user=timeline.user,
+            in_reply_to=None,
+            retweeted_tweet=None,
+            quote=None,
+            hashtags=["synthetic"] if timeline.sequence % 3 == 0 else [],
+            lang="en",
+            media=(
+                [SimpleNamespace(media_url=f"https://pbs.twimg.com/media/{tweet_id}.jpg")]
+                if has_media
+                else []
+            ),
+        )
+
+
+class FakeClient:
+    """Stands in for twikit's Client, serving timelines with latency and injected 429s."""
+
+    def __init__(
+        self,
+        timelines: FakeTimelines,
+        latency: float = 0.0,
+        rate_limits: float = 0.0,
+        page_size: int | None = None,
+    ) -> None:
+        self.timelines = timelines
+        self.latency = latency
+        self.rate_limits = rate_limits
+        self.page_size = page_size
+        self.calls = 0
+        self.client_transaction = SimpleNamespace(home_page_response=None)
+        self.http = SimpleNamespace(cookies=SimpleNamespace(jar=[]))
+        self._random = random.Random(1)
+
+    async def _request(self):
+        self.calls += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        if self._random.random() < self.rate_limits:
+            raise TooManyRequests(
+                "Rate limit exceeded", headers={"x-rate-limit-reset": str(int(time()) + 1)}
+            )
+
+    async def get_user_by_screen_name(self, screen_name: str) -> FakeUser:
+        await self._request()
+        return self.timelines.user(screen_name)
+
+    async def get_user_tweets(
+        self, user_id: str, tweet_type: str, count: int = 40, cursor: str | None = None
+    ) -> FakePage:
+        await self._request()
+        count = min(count, self.page_size or count)
+        tweets = self.timelines.timeline(user_id)
+        start = int(cursor) if cursor is not None else 0
+        # NOTE: Timelines are kept oldest first, pages are served newest first.
+        end = max(len(tweets) - start, 0)
+        page = FakePage(reversed(tweets[max(end - count, 0) : end]))
+        page.next_cursor = str(start + count)
+        return page
+
+
+class FakeChannel:
+    """A Discord text channel that records when every tweet reached it."""
+
+    def __init__(self, channel_id: int, sink: "FakeSink", latency: float = 0.0) -> None:
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+        self.guild = SimpleNamespace(id=1)
+        self._sink = sink
+        self._latency = latency
+
+    async def send(self, content: str, embeds: list[Embed], files: list | None = None):
+        if self._latency > 0:
+            await asyncio.sleep(self._latency)
+
+        self._sink.record(embeds)
+
+
+class FakeSink:
+    def __init__(self, timelines: FakeTimelines) -> None:
+        self.timelines = timelines
+        self.messages = 0
+        self.posts = 0
+        self.latencies: list[float] = []
+
+    def record(self, embeds: list[Embed]):
+        now = perf_counter()
+        self.messages += 1
+        # NOTE: The embeds of a gallery share the url of their tweet.
+        for url in dict.fromkeys(embed.url for embed in embeds):
+            tweet_id = (url or "").rsplit("/", 1)[-1]
+            published_at = self.timelines.published.get(tweet_id)
+            if published_at is not None:
+                self.posts += 1
+                self.latencies.append(now - published_at)
+
+
+class FakeBot:
+    def __init__(self, channels: dict[int, FakeChannel]) -> None:
+        self._channels = channels
+
+    def get_channel(self, channel_id: int) -> FakeChannel | None:
+        return self._channels.get(channel_id)
@@ -0,0 +1,192 @@
+"""
+End-to-end benchmark of the polling path against fake X and Discord backends.
+
+    uv run python -m benchmarks.polling --subscriptions 500 --users 200 --ticks 20
+
+Every tick advances the synthetic timelines by one poll interval, polls every account
+once through SubscribeCog, and waits until the cursors are flushed and the outbox is
+drained into the fake channels.
+"""
+
+import argparse
+import asyncio
+import logging
+import resource
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from actions.subscribe import SubscribeCog
+from benchmarks.fakes import FakeBot
+from benchmarks.fakes import FakeChannel
+from benchmarks.fakes import FakeClient
+from benchmarks.fakes import FakeSink
+from benchmarks.fakes import FakeTimelines
+from models.config import Configuration
+from models.database import Subscription
+from services.cache import TweetCache
+from services.cursors import CursorStore
+from services.database import DatabaseService
+from services.delivery import DeliveryService
+from services.outbox import OutboxService
+from services.registry import SubscriptionRegistry
+from services.scheduler import PollKey
+from services.scheduler import make_poll_key
+from services.x import XService
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from uuid import UUID
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if len(values) == 0:
+        return 0.0
+
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def make_config(database_path: str) -> Configuration:
+    return Configuration(
+        database_path=database_path,
+        discord_token="benchmark",  # noqa: S106
+        x_cookies_json='{"auth_token": "benchmark", "ct0": "benchmark"}',
+        # NOTE: The benchmark drives every poll itself, the scheduler must stay out of it.
+        fetch_interval=10**6,
+        fetch_page_interval=0,
+        x_request_burst=10**6,
+        x_requests_per_minute=10**6,
+    )
+
+
+async def wait_until(predicate: "Callable[[], bool]", interval: float = 0.001):
+    while not predicate():  # noqa: ASYNC110
+        await asyncio.sleep(interval)
+
+
+async def run(args: argparse.Namespace):
+    if args.subscriptions > args.users * args.channels:
+        raise SystemExit("Every subscription needs its own (account, channel) pair.")
+
+    usernames = [f"user{idx}" for idx in range(args.users)]
+    timelines = FakeTimelines(usernames, rate=args.rate / 3600, seed=args.seed)
+    timelines.advance(args.interval)
+    # NOTE: A subscription to an empty timeline only seeds, every one needs a tweet to start.
+    timelines.seed()
+    client = FakeClient(
+        timelines, latency=args.x_latency, rate_limits=args.rate_limits, page_size=args.page_size
+    )
+    sink = FakeSink(timelines)
+    channels = {
+        idx: FakeChannel(idx, sink, latency=args.send_latency)
+        for idx in range(1, args.channels + 1)
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        (Path(directory) / "tracker.db").touch()
+        config = make_config(directory)
+        bot = FakeBot(channels)
+        db = DatabaseService(config)
+        db.initialize()
+        cache = TweetCache(config)
+        x = XService(config, db, cache)
+        for account in x._pool.accounts():
+            account.client = client
+
+        delivery = DeliveryService(config)
+        outbox = OutboxService(config, db, delivery, bot.get_channel)
+        cursors = CursorStore(config, db, on_flushed=outbox.wake)
+        registry = SubscriptionRegistry(db, cursors)
+        cog = SubscribeCog(
+            bot=bot,
+            config=config,
+            x=x,
+            db=db,
+            registry=registry,
+            cursors=cursors,
+            delivery=delivery,
+            outbox=outbox,
+            cache=cache,
+        )
+        await cog.initialize()
+        # NOTE: Flushing and draining are driven by the benchmark, so that every tick settles.
+        await cursors.close()
+        await outbox.stop()
+        try:
+            keys: dict[PollKey, set[UUID]] = defaultdict(set)
+            for idx in range(args.subscriptions):
+                username = usernames[idx % len(usernames)]
+                latest = timelines.timeline(timelines.user(username).id)[-1]
+                subscription = Subscription(
+                    username=username,
+                    channel_id=str(idx // len(usernames) % len(channels) + 1),
+                    guild_id="1",
+                    last_tweet_id=latest.id,
+                    last_tweeted_at=latest.created_at_datetime,
+                )
+                await registry.add(subscription)
+                keys[make_poll_key(username, subscription.fetch_type)].add(subscription.id)
+
+            started_at = {username: timelines.sequence(username) for username in usernames}
+            posted = 0
+            calls: list[int] = []
+            elapsed = 0.0
+            for _ in range(args.ticks):
+                posted += timelines.advance(args.interval)
+                calls_before = client.calls
+                started = perf_counter()
+
+                for key, subscription_ids in keys.items():
+                    await cog.on_poll(key, frozenset(subscription_ids))
+                await wait_until(lambda: not any(cog.is_busy(key) for key in keys))
+
+                await cursors.flush()
+                while await outbox.drain() != 0:
+                    await wait_until(lambda: len(outbox) == 0)
+
+                elapsed += perf_counter() - started
+                calls.append(client.calls - calls_before)
+
+            subscribed = [usernames[idx % len(usernames)] for idx in range(args.subscriptions)]
+            expected = sum(timelines.sequence(item) - started_at[item] for item in subscribed)
+        finally:
+            await cog.cog_unload()
+            await db._get_async_engine().dispose()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"subscriptions        {args.subscriptions} ({args.users} accounts)")
+    print(f"ticks                {args.ticks} x {args.interval}s simulated")
+    print(f"tweets posted        {posted} ({expected} deliveries expected)")
+    print(f"tweets delivered     {sink.posts} in {sink.messages} messages")
+    print(f"throughput           {sink.posts / max(elapsed, 1e-9):.1f} tweets/s")
+    print(f"latency p50          {percentile(sink.latencies, 0.5) * 1000:.1f} ms")
+    print(f"latency p99          {percentile(sink.latencies, 0.99) * 1000:.1f} ms")
+    print(f"api calls per tick   {sum(calls) / max(len(calls), 1):.1f} (max {max(calls)})")
+    print(f"tweet cache          {cache.stats()}")
+    print(f"peak rss             {peak_rss:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--subscriptions", type=int, default=200)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=600, help="Simulated seconds per tick.")
+    parser.add_argument("--rate", type=float, default=6, help="Mean tweets per account per hour.")
+    parser.add_argument("--page-size", type=int, default=None)
+    parser.add_argument("--x-latency", type=float, default=0.05)
+    parser.add_argument("--send-latency", type=float, default=0.01)
+    parser.add_argument("--rate-limits", type=float, default=0.0, help="Share of X calls 429ed.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
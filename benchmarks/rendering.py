@@ -0,0 +1,107 @@
+"""
+Benchmark of tweet rendering on its own, from records to the embeds of a channel profile.
+
+    uv run python -m benchmarks.rendering --tweets 20000 --batch 200 --quote-characters 5000
+
+Bursts of synthetic tweets, a share of them with galleries and quotes, are rendered in
+batches the way a poll renders a backlog, and every embed is checked against Discord's
+length limits.
+"""
+
+import argparse
+import random
+from datetime import UTC
+from datetime import datetime
+from time import perf_counter
+
+from models.config import Configuration
+from models.tweet import TweetRecord
+from services.delivery import MAX_EMBED_CHARACTERS
+from services.renderer import MAX_DESCRIPTION_CHARACTERS
+from services.renderer import Renderer
+
+
+def make_tweets(args: argparse.Namespace) -> list[TweetRecord]:
+    rng = random.Random(args.seed)
+    now = datetime.now(UTC)
+    tweets = []
+    for idx in range(args.tweets):
+        user = idx % args.users
+        quote = None
+        if rng.random() < args.quotes:
+            quote = TweetRecord(
+                id=str(10**18 + idx),
+                created_at=now,
+                full_text="q" * args.quote_characters,
+                screen_name=f"quoted{user}",
+                name=f"Quoted {user}",
+                profile_image_url=f"https://pbs.twimg.com/profile_images/{user}/q_normal.jpg",
+            )
+        media = rng.random() < args.media
+        tweets.append(
+            TweetRecord(
+                id=str(2 * 10**18 + idx),
+                created_at=now,
+                full_text=f"Synthetic tweet {idx} " * 8,
+                screen_name=f"user{user}",
+                name=f"User {user}",
+                profile_image_url=f"https://pbs.twimg.com/profile_images/{user}/a_normal.jpg",
+                quote=quote,
+                media_urls=(
+                    tuple(f"https://pbs.twimg.com/media/{idx}_{n}.jpg" for n in range(4))
+                    if media
+                    else ()
+                ),
+            )
+        )
+    return tweets
+
+
+def run(args: argparse.Namespace):
+    config = Configuration(
+        database_path=".",
+        discord_token="benchmark",  # noqa: S106
+        x_cookies_json="{}",
+        render_profiles_json=args.profiles,
+    )
+    profile = Renderer(config).profile(args.channel)
+    tweets = make_tweets(args)
+
+    started = perf_counter()
+    rendered = [
+        embeds
+        for start in range(0, len(tweets), args.batch)
+        for embeds in profile.render_many(tweets[start : start + args.batch])
+    ]
+    elapsed = perf_counter() - started
+
+    oversized = sum(
+        1
+        for embeds in rendered
+        if sum(len(embed) for embed in embeds) > MAX_EMBED_CHARACTERS
+        or len(embeds[0].description or "") > MAX_DESCRIPTION_CHARACTERS
+    )
+    print(f"profile              {profile.name}")
+    print(f"tweets rendered      {len(rendered)} in batches of {args.batch}")
+    print(f"embeds               {sum(len(embeds) for embeds in rendered)}")
+    print(f"per tweet            {elapsed / max(len(rendered), 1) * 10**6:.1f} us")
+    print(f"throughput           {len(rendered) / max(elapsed, 1e-9):.0f} tweets/s")
+    print(f"over discord limits  {oversized}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--tweets", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--media", type=float, default=0.25, help="Share of tweets with images.")
+    parser.add_argument("--quotes", type=float, default=0.2, help="Share of quote tweets.")
+    parser.add_argument("--quote-characters", type=int, default=280)
+    parser.add_argument("--profiles", default="{}", help="RENDER_PROFILES_JSON to render with.")
+    parser.add_argument("--channel", default="default", help="Channel id of the profile.")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
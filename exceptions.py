@@ -4,3 +4,11 @@ class ConfigurationError(Exception):
 
 class SubscriptionNotFoundError(Exception):
     pass
+
+
+class RateLimitExceededError(Exception):
+    pass
+
+
+class WorkerLostError(Exception):
+    pass
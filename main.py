@@ -10,7 +10,19 @@ from discord.ext import commands
 from actions.admin import AdminCog
 from actions.subscribe import SubscribeCog
 from models.config import read_config
+from services.cache import TweetCache
+from services.commands import CommandSyncService
+from services.cursors import CursorStore
 from services.database import DatabaseService
+from services.delivery import DeliveryService
+from services.export import ExportService
+from services.media import MediaCache
+from services.metrics import MetricsServer
+from services.onboarding import OnboardingService
+from services.outbox import OutboxService
+from services.registry import SubscriptionRegistry
+from services.shard import ShardCoordinator
+from services.shard import share_budget
 from services.x import XService
 
 logging.basicConfig(
@@ -30,17 +42,24 @@ class BotClient(commands.Bot):
             command_prefix=".",
         )
 
-    async def setup_hook(self):
-        async for guild in self.fetch_guilds():
-            self.tree.copy_global_to(guild=guild)
-            await self.tree.sync(guild=guild)
-
 
 config = read_config()
 
-db = DatabaseService(config)
-x = XService(config)
 bot = BotClient()
+db = DatabaseService(config)
+cache = TweetCache(config)
+# NOTE: With shard workers, /subscribe and imports use the bot's share of the X budget.
+x = XService(share_budget(config), db, cache)
+delivery = DeliveryService(config)
+media = MediaCache(config) if config.media_cache_size > 0 else None
+outbox = OutboxService(config, db, delivery, bot.get_channel, media)
+cursors = CursorStore(config, db, on_flushed=outbox.wake)
+registry = SubscriptionRegistry(db, cursors)
+metrics = MetricsServer(config)
+export = ExportService(config)
+onboarding = OnboardingService(config, x, registry, cache)
+command_sync = CommandSyncService(config, db, bot.tree)
+shard = ShardCoordinator(config) if config.shard_workers > 0 else None
 
 
 @bot.event
@@ -60,17 +79,36 @@ async def on_command_error(ctx: commands.context.Context, error: commands.errors
 
 @bot.event
 async def on_ready():
-    bot.tree.on_error = on_tree_error
+    # NOTE: on_ready fires again after every gateway reconnect, everything below runs once.
+    if bot.get_cog(SubscribeCog.__name__) is not None:
+        log.info(f"Bot {bot.user} reconnected.")
+        return
 
-    subscribe_cog = SubscribeCog(bot=bot, config=config, db=db, x=x)
-    admin_cog = AdminCog(bot=bot, config=config)
+    bot.tree.on_error = on_tree_error
+    await metrics.start()
+
+    subscribe_cog = SubscribeCog(
+        bot=bot,
+        config=config,
+        db=db,
+        x=x,
+        registry=registry,
+        cursors=cursors,
+        delivery=delivery,
+        outbox=outbox,
+        cache=cache,
+        shard=shard,
+    )
+    admin_cog = AdminCog(
+        bot=bot, config=config, export=export, onboarding=onboarding, registry=registry
+    )
     await asyncio.gather(*[bot.add_cog(cog) for cog in [subscribe_cog, admin_cog]])
 
     log.info(f"Bot {bot.user} is online.")
-    await subscribe_cog.initialize()
-
-    slash = await bot.tree.sync()
-    log.info(f"{len(slash)} Slash commands synchronized.")
+    await asyncio.gather(
+        subscribe_cog.initialize(),
+        command_sync.sync([guild.id for guild in bot.guilds]),
+    )
 
 
 if __name__ == "__main__":
@@ -1,3 +1,4 @@
 from typing import Literal
+from typing import TypeAlias
 
-type FetchType = Literal["Tweets", "Replies", "Media", "Likes"]
+FetchType: TypeAlias = Literal["Tweets", "Replies", "Media", "Likes"]
@@ -11,21 +11,96 @@ from exceptions import ConfigurationError
 class Configuration(BaseModel):
     model_config = ConfigDict(frozen=True)
 
+    catchup_max_backlog: int = Field(default=50)
+    catchup_summary: bool = Field(default=True)
+    command_sync_concurrency: int = Field(default=5)
+    cursor_flush_batch: int = Field(default=100)
+    cursor_flush_interval: int = Field(default=1000)
+    database_busy_timeout: int = Field(default=5000)
+    database_echo: bool = Field(default=False)
     database_path: str
+    database_pool_size: int = Field(default=5)
+    delivery_batch_size: int = Field(default=50)
+    delivery_idle_timeout: int = Field(default=300)
+    delivery_max_retries: int = Field(default=3)
+    delivery_queue_size: int = Field(default=100)
     discord_admin_users: list[str] = Field(default=[])
     discord_token: str
+    fetch_concurrency: int = Field(default=4)
     fetch_interval: int = Field(default=10)
     fetch_page_interval: int = Field(default=10)
+    fetch_timeout: int = Field(default=600)
+    media_cache_size: int = Field(default=256)
+    media_concurrency: int = Field(default=4)
+    media_revalidate_after: int = Field(default=86400)
+    metrics_host: str = Field(default="127.0.0.1")
+    metrics_port: int = Field(default=0)
+    outbox_batch_size: int = Field(default=100)
+    outbox_max_attempts: int = Field(default=5)
+    outbox_poll_interval: int = Field(default=5)
+    outbox_retention: int = Field(default=72)
+    outbox_retry_after: int = Field(default=30)
+    pipeline_queue_size: int = Field(default=64)
+    poll_boost_duration: int = Field(default=600)
+    poll_max_interval: int = Field(default=1800)
+    poll_min_interval: int = Field(default=60)
+    render_profiles_json: str = Field(default="{}")
+    render_timeout: int = Field(default=30)
+    send_concurrency: int = Field(default=4)
+    send_timeout: int = Field(default=120)
+    shard_workers: int = Field(default=0)
     timezone_text: str = Field(default="Asia/Tokyo")
+    tweet_cache_size: int = Field(default=32)
+    user_cache_ttl: int = Field(default=86400)
+    x_account_cooldown: int = Field(default=900)
+    x_backoff_base: float = Field(default=2.0)
     x_cookies_json: str
+    x_max_budget_wait: int = Field(default=300)
+    x_max_retries: int = Field(default=3)
+    x_request_burst: int = Field(default=5)
+    x_requests_per_minute: int = Field(default=30)
+    x_session_check_interval: int = Field(default=900)
 
 
 def read_config() -> Configuration:
     dotenv.load_dotenv()
 
+    raw_catchup_max_backlog = environ.get("CATCHUP_MAX_BACKLOG", "50")
+    catchup_summary = environ.get("CATCHUP_SUMMARY", "true").lower() in ("1", "true", "yes")
+    raw_command_sync_concurrency = environ.get("COMMAND_SYNC_CONCURRENCY", "5")
+    raw_cursor_flush_batch = environ.get("CURSOR_FLUSH_BATCH", "100")
+    raw_cursor_flush_interval = environ.get("CURSOR_FLUSH_INTERVAL", "1000")
+    raw_database_busy_timeout = environ.get("DATABASE_BUSY_TIMEOUT", "5000")
+    database_echo = environ.get("DATABASE_ECHO", "false").lower() in ("1", "true", "yes")
     database_path = environ.get("DATABASE_PATH")
+    raw_database_pool_size = environ.get("DATABASE_POOL_SIZE", "5")
+    raw_delivery_batch_size = environ.get("DELIVERY_BATCH_SIZE", "50")
+    raw_delivery_idle_timeout = environ.get("DELIVERY_IDLE_TIMEOUT", "300")
+    raw_delivery_max_retries = environ.get("DELIVERY_MAX_RETRIES", "3")
+    raw_delivery_queue_size = environ.get("DELIVERY_QUEUE_SIZE", "100")
+    raw_fetch_concurrency = environ.get("FETCH_CONCURRENCY", "4")
     raw_fetch_interval = environ.get("FETCH_INTERVAL", "10")
     raw_fetch_page_interval = environ.get("FETCH_PAGE_INTERVAL", "10")
+    raw_fetch_timeout = environ.get("FETCH_TIMEOUT", "600")
+    raw_media_cache_size = environ.get("MEDIA_CACHE_SIZE", "256")
+    raw_media_concurrency = environ.get("MEDIA_CONCURRENCY", "4")
+    raw_media_revalidate_after = environ.get("MEDIA_REVALIDATE_AFTER", "86400")
+    metrics_host = environ.get("METRICS_HOST", "127.0.0.1")
+    raw_metrics_port = environ.get("METRICS_PORT", "0")
+    raw_outbox_batch_size = environ.get("OUTBOX_BATCH_SIZE", "100")
+    raw_outbox_max_attempts = environ.get("OUTBOX_MAX_ATTEMPTS", "5")
+    raw_outbox_poll_interval = environ.get("OUTBOX_POLL_INTERVAL", "5")
+    raw_outbox_retention = environ.get("OUTBOX_RETENTION", "72")
+    raw_outbox_retry_after = environ.get("OUTBOX_RETRY_AFTER", "30")
+    raw_pipeline_queue_size = environ.get("PIPELINE_QUEUE_SIZE", "64")
+    raw_poll_boost_duration = environ.get("POLL_BOOST_DURATION", "600")
+    raw_poll_max_interval = environ.get("POLL_MAX_INTERVAL", "1800")
+    raw_poll_min_interval = environ.get("POLL_MIN_INTERVAL", "60")
+    render_profiles_json = environ.get("RENDER_PROFILES_JSON", "{}")
+    raw_render_timeout = environ.get("RENDER_TIMEOUT", "30")
+    raw_send_concurrency = environ.get("SEND_CONCURRENCY", "4")
+    raw_send_timeout = environ.get("SEND_TIMEOUT", "120")
+    raw_shard_workers = environ.get("SHARD_WORKERS", "0")
     x_cookies_json = environ.get("X_COOKIES_JSON")
     raw_discord_admin_users = environ.get("DISCORD_ADMIN_USERS")
     discord_admin_users = (
@@ -33,18 +108,69 @@ def read_config() -> Configuration:
     )
     discord_token = environ.get("DISCORD_TOKEN")
     timezone_text = environ.get("TIMEZONE_TEXT", "Asia/Tokyo")
+    raw_tweet_cache_size = environ.get("TWEET_CACHE_SIZE", "32")
+    raw_user_cache_ttl = environ.get("USER_CACHE_TTL", "86400")
+    raw_x_account_cooldown = environ.get("X_ACCOUNT_COOLDOWN", "900")
+    raw_x_backoff_base = environ.get("X_BACKOFF_BASE", "2.0")
+    raw_x_max_budget_wait = environ.get("X_MAX_BUDGET_WAIT", "300")
+    raw_x_max_retries = environ.get("X_MAX_RETRIES", "3")
+    raw_x_request_burst = environ.get("X_REQUEST_BURST", "5")
+    raw_x_requests_per_minute = environ.get("X_REQUESTS_PER_MINUTE", "30")
+    raw_x_session_check_interval = environ.get("X_SESSION_CHECK_INTERVAL", "900")
 
     if any(item is None for item in [x_cookies_json, database_path, discord_token]):
         raise ConfigurationError
 
     return Configuration(
+        catchup_max_backlog=int(raw_catchup_max_backlog),
+        catchup_summary=catchup_summary,
+        command_sync_concurrency=int(raw_command_sync_concurrency),
+        cursor_flush_batch=int(raw_cursor_flush_batch),
+        cursor_flush_interval=int(raw_cursor_flush_interval),
+        database_busy_timeout=int(raw_database_busy_timeout),
+        database_echo=database_echo,
         database_path=database_path,
+        database_pool_size=int(raw_database_pool_size),
+        delivery_batch_size=int(raw_delivery_batch_size),
+        delivery_idle_timeout=int(raw_delivery_idle_timeout),
+        delivery_max_retries=int(raw_delivery_max_retries),
+        delivery_queue_size=int(raw_delivery_queue_size),
         discord_admin_users=discord_admin_users,
+        fetch_concurrency=int(raw_fetch_concurrency),
         fetch_interval=int(raw_fetch_interval),
         fetch_page_interval=int(raw_fetch_page_interval),
+        fetch_timeout=int(raw_fetch_timeout),
+        media_cache_size=int(raw_media_cache_size),
+        media_concurrency=int(raw_media_concurrency),
+        media_revalidate_after=int(raw_media_revalidate_after),
+        metrics_host=metrics_host,
+        metrics_port=int(raw_metrics_port),
+        outbox_batch_size=int(raw_outbox_batch_size),
+        outbox_max_attempts=int(raw_outbox_max_attempts),
+        outbox_poll_interval=int(raw_outbox_poll_interval),
+        outbox_retention=int(raw_outbox_retention),
+        outbox_retry_after=int(raw_outbox_retry_after),
+        pipeline_queue_size=int(raw_pipeline_queue_size),
+        poll_boost_duration=int(raw_poll_boost_duration),
+        poll_max_interval=int(raw_poll_max_interval),
+        poll_min_interval=int(raw_poll_min_interval),
+        render_profiles_json=render_profiles_json,
+        render_timeout=int(raw_render_timeout),
+        send_concurrency=int(raw_send_concurrency),
+        send_timeout=int(raw_send_timeout),
+        shard_workers=int(raw_shard_workers),
         x_cookies_json=x_cookies_json,
         discord_token=discord_token,
         timezone_text=timezone_text,
+        tweet_cache_size=int(raw_tweet_cache_size),
+        user_cache_ttl=int(raw_user_cache_ttl),
+        x_account_cooldown=int(raw_x_account_cooldown),
+        x_backoff_base=float(raw_x_backoff_base),
+        x_max_budget_wait=int(raw_x_max_budget_wait),
+        x_max_retries=int(raw_x_max_retries),
+        x_request_burst=int(raw_x_request_burst),
+        x_requests_per_minute=int(raw_x_requests_per_minute),
+        x_session_check_interval=int(raw_x_session_check_interval),
     )
 
 
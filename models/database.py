@@ -10,16 +10,60 @@ from sqlmodel import SQLModel
 class Subscription(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
 
-    channel_id: str
-    guild_id: str
+    channel_id: str = Field(index=True)
+    guild_id: str = Field(index=True)
     last_tweet_id: str | None = Field(default=None, nullable=True)
     last_tweeted_at: DateTime | None = Field(default=None, nullable=True)
-    username: str
+    activity_gap: float | None = Field(default=None, nullable=True)
+    username: str = Field(index=True)
 
     fetch_type: str = Field(default="Tweets")
     ignore_replies: bool = Field(default=False)
     ignore_retweets: bool = Field(default=False)
+    filters: str | None = Field(default=None, nullable=True)
 
     created_at: DateTime = Field(default_factory=lambda: PendulumDateTime.now(tz="Asia/Tokyo"))
+    updated_at: DateTime | None = Field(
+        default_factory=lambda: PendulumDateTime.now(tz="UTC"), nullable=True, index=True
+    )
 
     __table_args__ = (UniqueConstraint("username", "channel_id", name="channel_subscription"),)
+
+
+class XUser(SQLModel, table=True):
+    screen_name: str = Field(primary_key=True)
+
+    user_id: str
+    name: str
+    profile_image_url: str | None = Field(default=None, nullable=True)
+
+    fetched_at: DateTime = Field(default_factory=lambda: PendulumDateTime.now(tz="UTC"))
+
+
+class OutboxEntry(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+
+    subscription_id: uuid.UUID = Field(index=True)
+    channel_id: str
+    username: str
+    tweet_id: str
+    payload: str
+
+    status: str = Field(default="pending", index=True)
+    attempts: int = Field(default=0)
+    last_error: str | None = Field(default=None, nullable=True)
+    next_attempt_at: DateTime = Field(default_factory=lambda: PendulumDateTime.now(tz="UTC"))
+
+    created_at: DateTime = Field(default_factory=lambda: PendulumDateTime.now(tz="UTC"))
+    updated_at: DateTime | None = Field(
+        default_factory=lambda: PendulumDateTime.now(tz="UTC"), nullable=True, index=True
+    )
+
+    __table_args__ = (UniqueConstraint("subscription_id", "tweet_id", name="outbox_delivery"),)
+
+
+class CommandSync(SQLModel, table=True):
+    scope: str = Field(primary_key=True)
+
+    tree_hash: str
+    synced_at: DateTime = Field(default_factory=lambda: PendulumDateTime.now(tz="UTC"))
@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Self
+
+from twikit import Tweet
+
+
+@dataclass(frozen=True, slots=True)
+class TweetRecord:
+    """
+    The part of a twikit Tweet that the bot actually uses. Records are built as soon as a
+    page arrives, so the raw GraphQL payload and nested objects are dropped right away.
+    """
+
+    id: str
+    created_at: datetime
+    full_text: str
+    screen_name: str
+    name: str
+    profile_image_url: str
+    in_reply_to: str | None = None
+    retweeted_tweet: "TweetRecord | None" = None
+    quote: "TweetRecord | None" = None
+    media_urls: tuple[str, ...] = ()
+    hashtags: tuple[str, ...] = ()
+    lang: str | None = None
+
+    @classmethod
+    def from_tweet(cls, tweet: Tweet) -> Self:
+        # NOTE: twikit parses these properties from the raw payload on every access.
+        retweet = tweet.retweeted_tweet
+        quote = tweet.quote
+        media = tweet.media
+
+        return cls(
+            id=tweet.id,
+            created_at=tweet.created_at_datetime,
+            full_text=tweet.full_text,
+            screen_name=tweet.user.screen_name,
+            name=tweet.user.name,
+            profile_image_url=tweet.user.profile_image_url,
+            in_reply_to=tweet.in_reply_to,
+            retweeted_tweet=cls.from_tweet(retweet) if retweet is not None else None,
+            quote=cls.from_tweet(quote) if quote is not None else None,
+            media_urls=tuple(item.media_url for item in media),
+            hashtags=tuple(tweet.hashtags),
+            lang=tweet.lang,
+        )
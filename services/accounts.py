@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import zlib
+from bisect import bisect
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from dataclasses import field
+from time import time
+from typing import TypeVar
+
+from twikit import AccountLocked
+from twikit import AccountSuspended
+from twikit import Client
+from twikit import TooManyRequests
+from twikit import Unauthorized
+from twikit.errors import TwitterException
+
+from exceptions import ConfigurationError
+from exceptions import RateLimitExceededError
+from models.config import Configuration
+from services.governor import RequestGovernor
+from services.metrics import gauge
+from services.session import SessionStore
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+VIRTUAL_NODES = 64
+
+X_GOVERNOR_QUEUE_DEPTH = gauge(
+    "x_governor_queue_depth", "X requests waiting on an account's budget.", labels=("account",)
+)
+X_ACCOUNT_HEALTHY = gauge(
+    "x_account_healthy", "1 while an X account is used, 0 while skipped.", labels=("account",)
+)
+
+
+def parse_cookie_sets(raw: str) -> list[dict]:
+    cookies = json.loads(raw)
+    if isinstance(cookies, dict):
+        return [cookies]
+
+    if not isinstance(cookies, list) or len(cookies) == 0:
+        raise ConfigurationError("X_COOKIES_JSON must be an object or a non-empty list of them.")
+
+    return cookies
+
+
+@dataclass(slots=True)
+class XAccount:
+    name: str
+    client: Client
+    governor: RequestGovernor
+    seed: dict = field(default_factory=dict)
+    restored: bool = False
+    owned: bool = True
+    unhealthy_until: float = field(default=0)
+
+    def is_healthy(self, now: float) -> bool:
+        return self.unhealthy_until <= now
+
+
+class AccountPool:
+    """
+    Authenticated X clients, one per cookie set. Usernames are assigned to accounts on a
+    consistent hash ring, so adding or losing an account only moves its own share of the
+    load; rate-limited or invalidated accounts are skipped until they recover. Sessions are
+    persisted after successful calls and checked every X_SESSION_CHECK_INTERVAL seconds, and
+    a saved session that X rejects falls back to the X_COOKIES_JSON seed. With shard workers,
+    every worker uses all the accounts but only saves the sessions of its own share of them.
+    """
+
+    _accounts: dict[str, XAccount]
+    _ring: list[tuple[int, str]]
+    _task: asyncio.Task | None
+
+    def __init__(self, config: Configuration, shard: int | None = None) -> None:
+        self._config = config
+        self._sessions = SessionStore(config)
+        self._accounts = {}
+        self._task = None
+        for idx, cookies in enumerate(parse_cookie_sets(config.x_cookies_json)):
+            governor = RequestGovernor(config)
+            client = Client(language="ja-JP", event_hooks={"response": [governor.observe]})
+            name = f"account-{idx}"
+            restored = self._sessions.restore(name, client, cookies)
+            # NOTE: The bot process only reads the sessions once workers poll.
+            owned = config.shard_workers == 0 or (
+                shard is not None and idx % config.shard_workers == shard
+            )
+            self._accounts[name] = XAccount(
+                name=name,
+                client=client,
+                governor=governor,
+                seed=cookies,
+                restored=restored,
+                owned=owned,
+            )
+
+        self._ring = sorted(
+            (zlib.crc32(f"{name}#{node}".encode()), name)
+            for name in self._accounts
+            for node in range(VIRTUAL_NODES)
+        )
+        X_GOVERNOR_QUEUE_DEPTH.watch(
+            "pool", lambda: {name: item["queue_depth"] for name, item in self.stats().items()}
+        )
+        X_ACCOUNT_HEALTHY.watch(
+            "pool", lambda: {name: int(item["healthy"]) for name, item in self.stats().items()}
+        )
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def accounts(self) -> list[XAccount]:
+        return list(self._accounts.values())
+
+    def _ring_order(self, key: str) -> Iterator[XAccount]:
+        start = bisect(self._ring, (zlib.crc32(key.lower().encode()), ""))
+        seen: set[str] = set()
+        for idx in range(len(self._ring)):
+            _, name = self._ring[(start + idx) % len(self._ring)]
+            if name not in seen:
+                seen.add(name)
+                yield self._accounts[name]
+
+            if len(seen) == len(self._accounts):
+                return
+
+    def candidates(self, key: str, endpoint: str) -> list[XAccount]:
+        now = time()
+        healthy = [account for account in self._ring_order(key) if account.is_healthy(now)]
+        # NOTE: Accounts with budget left come first, exhausted ones are the last resort.
+        return sorted(healthy, key=lambda account: not account.governor.available(endpoint))
+
+    def _mark_unhealthy(self, account: XAccount, until: float, reason: Exception):
+        account.unhealthy_until = max(account.unhealthy_until, until)
+        logger.warning(f"[Pool:{account.name}] Unhealthy until {until:.0f}: {reason}")
+
+    async def _save(self, account: XAccount):
+        if account.owned:
+            await self._sessions.save(account.name, account.client)
+
+    async def _reject(self, account: XAccount, reason: Exception):
+        if account.restored:
+            # NOTE: The saved session went stale, the seed may still be good.
+            account.restored = False
+            await self._sessions.reset(
+                account.name, account.client, account.seed, forget=account.owned
+            )
+            return
+
+        self._mark_unhealthy(account, time() + self._config.x_account_cooldown, reason)
+
+    async def call(self, key: str, endpoint: str, func: Callable[[Client], Awaitable[T]]) -> T:
+        limited: list[XAccount] = []
+        for account in self.candidates(key, endpoint):
+            try:
+                result = await account.governor.try_call(endpoint, func, account.client)
+            except RateLimitExceededError as e:
+                # NOTE: Only this endpoint's budget is gone, the governor already tracks it.
+                logger.info(f"[Pool:{account.name}] Failing over: {e}")
+                limited.append(account)
+            except (Unauthorized, AccountLocked, AccountSuspended) as e:
+                await self._reject(account, e)
+            else:
+                await self._save(account)
+                return result
+
+        # NOTE: The accounts left are out of budget for this endpoint, the first to reset waits.
+        now = time()
+        waiting = [account for account in limited if account.is_healthy(now)]
+        if len(waiting) == 0:
+            raise RateLimitExceededError(f"No healthy X account left for {endpoint}")
+
+        account = min(waiting, key=lambda item: item.governor.budget(endpoint).wait_seconds(now))
+        try:
+            result = await account.governor.call(endpoint, func, account.client)
+        except TooManyRequests as e:
+            raise RateLimitExceededError(f"{endpoint} is rate-limited on every X account") from e
+        except (Unauthorized, AccountLocked, AccountSuspended) as e:
+            await self._reject(account, e)
+            raise RateLimitExceededError(f"No healthy X account left for {endpoint}") from e
+
+        await self._save(account)
+        return result
+
+    async def check(self):
+        """Asks X for the settings of every healthy account, to catch dead sessions early."""
+        now = time()
+        for account in self.accounts():
+            if not account.is_healthy(now):
+                continue
+
+            try:
+                await account.governor.try_call(
+                    "settings", lambda client: client.v11.settings(), account.client
+                )
+            except (Unauthorized, AccountLocked, AccountSuspended) as e:
+                await self._reject(account, e)
+            except (RateLimitExceededError, TwitterException) as e:
+                logger.info(f"[Pool:{account.name}] Session check skipped: {e}")
+            else:
+                await self._save(account)
+
+    def start(self):
+        if self._task is None and self._config.x_session_check_interval > 0:
+            self._task = asyncio.create_task(self._run(), name="sessions")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._config.x_session_check_interval)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("[Pool] Failure to check the X sessions.")
+
+    def stats(self) -> dict:
+        now = time()
+        return {
+            account.name: {
+                "healthy": account.is_healthy(now),
+                **account.governor.stats(),
+            }
+            for account in self._accounts.values()
+        }
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from collections.abc import Hashable
+from time import time
+from typing import Any
+
+from discord import Embed
+
+from models.config import Configuration
+from models.tweet import TweetRecord
+from services.metrics import counter
+from services.metrics import gauge
+from services.scheduler import PollKey
+
+TWEET_CACHE_BYTES = gauge("tweet_cache_bytes", "Estimated size of the tweet cache.")
+TWEET_CACHE_LOOKUPS = counter(
+    "tweet_cache_lookups_total", "Tweet cache lookups.", labels=("result",)
+)
+# NOTE: The newest tweets are small, the bound only stops an ever growing set of timelines.
+LATEST_TIMELINES = 10_000
+
+
+def embed_size(embeds: list[Embed]) -> int:
+    return sum(len(embed) * 2 + 1024 for embed in embeds)
+
+
+class LRUCache:
+    """Least recently used cache bounded by the estimated size of its values in bytes."""
+
+    _items: OrderedDict[Hashable, tuple[Any, int]]
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Any | None:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._items.move_to_end(key)
+        return item[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        if (previous := self._items.pop(key, None)) is not None:
+            self.size -= previous[1]
+
+        if size > self.max_bytes:
+            return
+
+        self._items[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "items": len(self._items),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TweetCache:
+    """
+    Process-wide cache of rendered embeds, keyed by profile and tweet id, so that
+    subscriptions sharing a timeline render every tweet once. Cached embeds are shared and
+    must be treated as read-only. The newest tweet of the recently polled timelines is kept
+    as well, which lets new subscriptions seed their cursor without asking X again as long as
+    the timeline was polled within the last fetch interval.
+    """
+
+    def __init__(self, config: Configuration) -> None:
+        self._items = LRUCache(config.tweet_cache_size * 1024 * 1024)
+        # NOTE: Every timeline counts as one, so the LRU bounds the number of timelines.
+        self._latest = LRUCache(LATEST_TIMELINES)
+        self._max_age = config.fetch_interval * 60
+        TWEET_CACHE_BYTES.watch("cache", lambda: self._items.size)
+
+    def remember(self, key: PollKey, tweets: list[TweetRecord]):
+        """Records a page of a poll, an empty page still proves the newest tweet is current."""
+        cached = self._latest.get(key)
+        latest = cached[0] if cached is not None else None
+        if len(tweets) != 0 and (latest is None or int(tweets[0].id) > int(latest.id)):
+            latest = tweets[0]
+        if latest is not None:
+            self._latest.put(key, (latest, time()), 1)
+
+    def latest(self, key: PollKey) -> TweetRecord | None:
+        """Returns the newest tweet of a timeline polled within the last fetch interval."""
+        cached = self._latest.get(key)
+        if cached is None or time() - cached[1] > self._max_age:
+            return None
+        return cached[0]
+
+    def embeds(
+        self,
+        tweets: list[TweetRecord],
+        profile: str,
+        render: Callable[[list[TweetRecord]], list[list[Embed]]],
+    ) -> list[list[Embed]]:
+        """Returns the embeds of every tweet, rendering all the missing ones in one batch."""
+        found = [self._items.get(("embed", profile, tweet.id)) for tweet in tweets]
+        missing = [tweet for tweet, embeds in zip(tweets, found, strict=True) if embeds is None]
+        rendered = iter(render(missing) if len(missing) != 0 else [])
+        TWEET_CACHE_LOOKUPS.inc(len(tweets) - len(missing), result="hit")
+        TWEET_CACHE_LOOKUPS.inc(len(missing), result="miss")
+
+        result = []
+        for tweet, cached in zip(tweets, found, strict=True):
+            embeds = cached
+            if embeds is None:
+                embeds = next(rendered)
+                self._items.put(("embed", profile, tweet.id), embeds, embed_size(embeds))
+            result.append(embeds)
+        return result
+
+    def stats(self) -> dict:
+        return self._items.stats()
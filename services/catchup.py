@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from dataclasses import field
+
+from models.database import Subscription
+from models.tweet import TweetRecord
+from services.x import XService
+
+
+@dataclass(slots=True)
+class Backlog:
+    """
+    The tweets a subscription still has to see, newest first, fed page by page as the
+    timeline is fetched. Up to LIMIT tweets are kept and the rest is only counted as skipped,
+    so a long outage never holds more than that in memory. The backlog is complete once the
+    stream has reached the subscription's own cursor.
+    """
+
+    subscription: Subscription
+    limit: int
+    tweets: list[TweetRecord] = field(default_factory=list)
+    skipped: int = 0
+    complete: bool = False
+
+    def __post_init__(self):
+        # NOTE: A subscription without cursor is only seeded, it has nothing to catch up on.
+        subscription = self.subscription
+        if subscription.last_tweet_id is None and subscription.last_tweeted_at is None:
+            self.complete = True
+
+    @property
+    def done(self) -> bool:
+        return self.complete or len(self.tweets) >= self.limit
+
+    def offer(self, page: list[TweetRecord], accepted: list[TweetRecord]):
+        """Takes a fetched page, and the part of it that the subscription's filters accept."""
+        if self.complete:
+            return
+
+        subscription = self.subscription
+        last_id = subscription.last_tweet_id
+        last_time = subscription.last_tweeted_at
+        if len(XService.newer_than(page, last_id=last_id, last_time=last_time)) < len(page):
+            self.complete = True
+
+        tweets = XService.newer_than(accepted, last_id=last_id, last_time=last_time)
+        room = max(self.limit - len(self.tweets), 0)
+        self.tweets.extend(tweets[:room])
+        self.skipped += len(tweets[room:])
+
+    def summary(self) -> str | None:
+        if self.complete and self.skipped == 0:
+            return None
+        if not self.complete and len(self.tweets) < self.limit:
+            return None
+
+        if self.complete:
+            return f"{self.skipped} more tweets skipped"
+        if self.skipped != 0:
+            return f"{self.skipped}+ more tweets skipped"
+        return "Older tweets skipped"
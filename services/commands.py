@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+import json
+import logging
+
+from discord import HTTPException
+from discord import Object
+from discord.app_commands import CommandTree
+
+from models.config import Configuration
+from services.database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = "global"
+
+
+def tree_hash(tree: CommandTree, guild: Object | None = None) -> str:
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda item: (item["type"], item["name"]),
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class CommandSyncService:
+    """
+    Syncs the application commands of the global scope and of every guild, skipping the
+    scopes whose command tree hashes the same as when they were last synced. Guilds are
+    synced concurrently, at most COMMAND_SYNC_CONCURRENCY at a time.
+    """
+
+    def __init__(self, config: Configuration, db: DatabaseService, tree: CommandTree) -> None:
+        self._config = config
+        self._db_service = db
+        self._tree = tree
+
+    async def sync(self, guild_ids: list[int]) -> int:
+        """Returns how many scopes were actually synced."""
+        hashes = await self._db_service.command_hashes()
+        semaphore = asyncio.Semaphore(self._config.command_sync_concurrency)
+
+        async def sync_scope(scope: str, guild: Object | None) -> bool:
+            digest = tree_hash(self._tree, guild)
+            if hashes.get(scope) == digest:
+                return False
+
+            async with semaphore:
+                try:
+                    commands = await self._tree.sync(guild=guild)
+                except HTTPException as e:
+                    logger.warning(f"[Commands:{scope}] Failure to sync commands: {e}")
+                    return False
+
+            await self._db_service.save_command_hash(scope, digest)
+            logger.info(f"[Commands:{scope}] {len(commands)} commands synchronized.")
+            return True
+
+        guilds = [Object(id=guild_id) for guild_id in guild_ids]
+        for guild in guilds:
+            self._tree.copy_global_to(guild=guild)
+
+        results = await asyncio.gather(
+            sync_scope(GLOBAL_SCOPE, None),
+            *[sync_scope(str(guild.id), guild) for guild in guilds],
+        )
+        logger.info(
+            f"[Commands] {sum(results)} of {len(results)} scopes synchronized, "
+            "the rest were unchanged."
+        )
+        return sum(results)
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from models.config import Configuration
+from models.database import OutboxEntry
+from services.database import DatabaseService
+from services.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+CURSORS_PENDING = gauge("cursors_pending", "Cursor updates waiting to be flushed.")
+
+
+class CursorStore:
+    """
+    Write-behind buffer for subscription cursors. Updates are coalesced per subscription
+    and written in a single transaction every CURSOR_FLUSH_INTERVAL milliseconds, or as
+    soon as CURSOR_FLUSH_BATCH subscriptions are waiting. Outbox entries travel in the same
+    transaction as the cursor move that produced them.
+    """
+
+    _pending: dict[UUID, tuple[str | None, datetime | None, float | None]]
+    _entries: list[OutboxEntry]
+    _task: asyncio.Task | None
+
+    def __init__(
+        self,
+        config: Configuration,
+        db: DatabaseService,
+        on_flushed: Callable[[], None] | None = None,
+    ) -> None:
+        self._config = config
+        self._db_service = db
+        self._on_flushed = on_flushed
+        self._pending = {}
+        self._entries = []
+        self._task = None
+        self._wake = asyncio.Event()
+        CURSORS_PENDING.watch("store", lambda: len(self._pending))
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="cursor-store")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        await self.flush()
+
+    def put(
+        self,
+        subscription_id: UUID,
+        last_tweet_id: str | None,
+        last_tweeted_at: datetime,
+        entries: list[OutboxEntry] | None = None,
+        activity_gap: float | None = None,
+    ):
+        self._pending[subscription_id] = (last_tweet_id, last_tweeted_at, activity_gap)
+        self._entries.extend(entries or [])
+        if len(self._pending) >= self._config.cursor_flush_batch:
+            self._wake.set()
+
+    def discard(self, subscription_id: UUID):
+        self._pending.pop(subscription_id, None)
+        self._entries = [item for item in self._entries if item.subscription_id != subscription_id]
+
+    async def flush(self):
+        if len(self._pending) == 0 and len(self._entries) == 0:
+            return
+
+        pending, self._pending = self._pending, {}
+        entries, self._entries = self._entries, []
+        try:
+            await self._db_service.update_cursors(pending, entries)
+        except Exception:
+            # NOTE: Newer updates that arrived during the failed flush win over the old ones.
+            self._pending = pending | self._pending
+            self._entries = entries + self._entries
+            raise
+
+        logger.debug(f"[Cursor] {len(pending)} cursors, {len(entries)} outbox entries flushed.")
+        if len(entries) != 0 and self._on_flushed is not None:
+            self._on_flushed()
+
+    async def _run(self):
+        interval = self._config.cursor_flush_interval / 1000
+        while True:
+            try:
+                async with asyncio.timeout(interval):
+                    await self._wake.wait()
+            except TimeoutError:
+                pass
+
+            self._wake.clear()
+            try:
+                await self.flush()
+            except SQLAlchemyError:
+                logger.exception("[Cursor] Failure to flush cursors, will retry.")
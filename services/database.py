@@ -1,16 +1,58 @@
+import logging
+from collections.abc import Collection
+from datetime import datetime
 from pathlib import Path
+from time import perf_counter
 from uuid import UUID
 
+from pendulum import DateTime as PendulumDateTime
 from sqlalchemy import Engine
 from sqlalchemy import create_engine
+from sqlalchemy import delete
+from sqlalchemy import event
+from sqlalchemy import inspect
+from sqlalchemy import text
+from sqlalchemy import tuple_
 from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import aliased
 from sqlmodel import SQLModel
+from sqlmodel import col
+from sqlmodel import func
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models.config import Configuration
+from models.database import CommandSync
+from models.database import OutboxEntry
 from models.database import Subscription
+from models.database import XUser
+from services.metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+DB_TRANSACTION_SECONDS = histogram(
+    "db_transaction_seconds", "Duration of SQLite transactions.", labels=("outcome",)
+)
+
+
+def _on_begin(connection):
+    connection.info["begun_at"] = perf_counter()
+
+
+def _on_end(outcome: str):
+    def listener(connection):
+        begun_at = connection.info.pop("begun_at", None)
+        if begun_at is not None:
+            DB_TRANSACTION_SECONDS.observe(perf_counter() - begun_at, outcome=outcome)
+
+    return listener
+
+
+def _instrument(engine: Engine):
+    event.listen(engine, "begin", _on_begin)
+    event.listen(engine, "commit", _on_end("commit"))
+    event.listen(engine, "rollback", _on_end("rollback"))
 
 
 class DatabaseService:
@@ -25,12 +67,22 @@ class DatabaseService:
     def _get_database_path(self):
         return Path(self._config.database_path) / "tracker.db"
 
+    def _set_pragmas(self, connection, _record):
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={self._config.database_busy_timeout}")
+        cursor.close()
+
     def _get_async_engine(self):
         if self._async_engine is None:
             self._async_engine = create_async_engine(
                 f"sqlite+aiosqlite:///{self._get_database_path()}?check_same_thread=false",
-                echo=True,
+                echo=self._config.database_echo,
+                pool_size=self._config.database_pool_size,
             )
+            event.listen(self._async_engine.sync_engine, "connect", self._set_pragmas)
+            _instrument(self._async_engine.sync_engine)
 
         return self._async_engine
 
@@ -38,8 +90,10 @@ class DatabaseService:
         if self._sync_engine is None:
             self._sync_engine = create_engine(
                 f"sqlite:///{self._get_database_path()}?check_same_thread=false",
-                echo=True,
+                echo=self._config.database_echo,
             )
+            event.listen(self._sync_engine, "connect", self._set_pragmas)
+            _instrument(self._sync_engine)
 
         return self._sync_engine
 
@@ -48,6 +102,32 @@ class DatabaseService:
             return
 
         SQLModel.metadata.create_all(self._get_sync_engine())
+        self._migrate(self._get_sync_engine())
+
+    def _migrate(self, engine: Engine):
+        """
+        Adds the nullable columns and the indexes that were introduced after a table had been
+        created.
+        """
+        inspector = inspect(engine)
+        with engine.begin() as connection:
+            for table in SQLModel.metadata.sorted_tables:
+                existing = {item["name"] for item in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing or not column.nullable:
+                        continue
+
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(
+                        text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+                    )
+                    logger.info(f"[Database] Column {table.name}.{column.name} added.")
+
+                indexes = {item["name"] for item in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in indexes:
+                        index.create(connection)
+                        logger.info(f"[Database] Index {index.name} created.")
 
     def session(self):
         return AsyncSession(self._get_async_engine())
@@ -61,6 +141,211 @@ class DatabaseService:
             results = await session.exec(stmt)
             return results.all()
 
+    def _scope(self, stmt, guild_id: str | None, channel_id: str | None):
+        if guild_id is not None:
+            stmt = stmt.where(Subscription.guild_id == guild_id)
+        if channel_id is not None:
+            stmt = stmt.where(Subscription.channel_id == channel_id)
+
+        return stmt
+
+    async def subscriptions_page(
+        self,
+        limit: int,
+        after: tuple[str, str, UUID] | None = None,
+        guild_id: str | None = None,
+        channel_id: str | None = None,
+    ) -> list[Subscription]:
+        """
+        Returns up to `limit` subscriptions ordered by (channel_id, username, id), starting
+        after the key of the last row of the previous page.
+        """
+        async with self.session() as session:
+            stmt = self._scope(select(Subscription), guild_id, channel_id)
+            key = tuple_(
+                col(Subscription.channel_id), col(Subscription.username), col(Subscription.id)
+            )
+            if after is not None:
+                stmt = stmt.where(key > after)
+
+            stmt = stmt.order_by(*key.clauses).limit(limit)
+            results = await session.exec(stmt)
+            return list(results.all())
+
+    async def count_subscriptions(
+        self, guild_id: str | None = None, channel_id: str | None = None
+    ) -> int:
+        async with self.session() as session:
+            stmt = self._scope(select(func.count()).select_from(Subscription), guild_id, channel_id)
+            return (await session.exec(stmt)).one()
+
+    async def add_subscription(self, subscription: Subscription):
+        async with self.session() as session:
+            session.add(subscription)
+            await session.commit()
+            await session.refresh(subscription)
+
+    async def add_subscriptions(self, subscriptions: list[Subscription]):
+        async with self.session() as session:
+            session.add_all(subscriptions)
+            await session.commit()
+            for subscription in subscriptions:
+                await session.refresh(subscription)
+
+    async def delete_subscription(self, subscription_id: UUID):
+        async with self.session() as session:
+            subscription = await session.get(Subscription, subscription_id)
+            if subscription is None:
+                return
+
+            await session.delete(subscription)
+            # NOTE: Tweets still waiting in the outbox are not posted after an unsubscribe.
+            await session.exec(
+                delete(OutboxEntry)
+                .where(col(OutboxEntry.subscription_id) == subscription_id)
+                .where(OutboxEntry.status == "pending")
+            )
+            await session.commit()
+
+    async def update_cursors(
+        self,
+        cursors: dict[UUID, tuple[str | None, datetime | None, float | None]],
+        entries: list[OutboxEntry] | None = None,
+    ):
+        entries = entries or []
+        if len(cursors) == 0 and len(entries) == 0:
+            return
+
+        async with self.session() as session:
+            stmt = select(Subscription).where(col(Subscription.id).in_(list(cursors)))
+            found = set()
+            for subscription in (await session.exec(stmt)).all():
+                found.add(subscription.id)
+                last_tweet_id, last_tweeted_at, activity_gap = cursors[subscription.id]
+                subscription.last_tweet_id = last_tweet_id
+                subscription.last_tweeted_at = last_tweeted_at
+                if activity_gap is not None:
+                    subscription.activity_gap = activity_gap
+                # NOTE: updated_at is left alone, a moving cursor would put every active
+                # subscription into each incremental export.
+                session.add(subscription)
+
+            if len(entries) != 0:
+                # NOTE: (subscription_id, tweet_id) is the idempotency key of the outbox, and
+                # the entries of subscriptions removed since they were fetched are dropped.
+                keys = {
+                    (item.subscription_id, item.tweet_id): item
+                    for item in entries
+                    if item.subscription_id in found
+                }
+                stmt = select(OutboxEntry.subscription_id, OutboxEntry.tweet_id).where(
+                    col(OutboxEntry.subscription_id).in_({key[0] for key in keys}),
+                    col(OutboxEntry.tweet_id).in_({key[1] for key in keys}),
+                )
+                for key in (await session.exec(stmt)).all():
+                    keys.pop(tuple(key), None)
+
+                session.add_all(keys.values())
+
+            await session.commit()
+
+    async def pending_outbox(self, limit: int, exclude: Collection[int] = ()):
+        async with self.session() as session:
+            now = PendulumDateTime.now(tz="UTC")
+            # NOTE: Tweets wait behind an earlier one of their subscription that backs off, so
+            # that a retry never lands after the tweets that followed it.
+            earlier = aliased(OutboxEntry)
+            backing_off = (
+                select(earlier.id)
+                .where(earlier.subscription_id == OutboxEntry.subscription_id)
+                .where(earlier.status == "pending")
+                .where(col(earlier.id) < OutboxEntry.id)
+                .where(col(earlier.next_attempt_at) > now)
+            )
+            stmt = (
+                select(OutboxEntry)
+                .where(OutboxEntry.status == "pending")
+                .where(col(OutboxEntry.next_attempt_at) <= now)
+                .where(~backing_off.exists())
+                .where(col(OutboxEntry.id).not_in(list(exclude)))
+                .order_by(col(OutboxEntry.id))
+                .limit(limit)
+            )
+            results = await session.exec(stmt)
+            return results.all()
+
+    async def mark_outbox_delivered(self, entry_ids: Collection[int]):
+        async with self.session() as session:
+            stmt = select(OutboxEntry).where(col(OutboxEntry.id).in_(list(entry_ids)))
+            for entry in (await session.exec(stmt)).all():
+                entry.status = "delivered"
+                entry.updated_at = PendulumDateTime.now(tz="UTC")
+                session.add(entry)
+
+            await session.commit()
+
+    async def mark_outbox_failed(
+        self, entry_ids: Collection[int], error: str, retry_after: float, max_attempts: int
+    ):
+        async with self.session() as session:
+            stmt = select(OutboxEntry).where(col(OutboxEntry.id).in_(list(entry_ids)))
+            for entry in (await session.exec(stmt)).all():
+                entry.attempts += 1
+                entry.last_error = error
+                entry.next_attempt_at = PendulumDateTime.now(tz="UTC").add(
+                    seconds=retry_after * 2 ** (entry.attempts - 1)
+                )
+                if entry.attempts >= max_attempts:
+                    entry.status = "dead"
+                entry.updated_at = PendulumDateTime.now(tz="UTC")
+                session.add(entry)
+
+            await session.commit()
+
+    async def purge_outbox(self, before: datetime, limit: int = 500) -> int:
+        async with self.session() as session:
+            stmt = (
+                select(OutboxEntry)
+                .where(OutboxEntry.status == "delivered")
+                .where(col(OutboxEntry.created_at) < before)
+                .limit(limit)
+            )
+            entries = (await session.exec(stmt)).all()
+            for entry in entries:
+                await session.delete(entry)
+
+            await session.commit()
+            return len(entries)
+
     async def get_one_subscription(self, subscription_id: UUID):
         async with self.session() as session:
             return await session.get_one(Subscription, subscription_id)
+
+    async def get_cached_user(self, screen_name: str) -> XUser | None:
+        async with self.session() as session:
+            return await session.get(XUser, screen_name)
+
+    async def get_cached_users(self, screen_names: Collection[str]) -> list[XUser]:
+        async with self.session() as session:
+            stmt = select(XUser).where(col(XUser.screen_name).in_(list(screen_names)))
+            results = await session.exec(stmt)
+            return list(results.all())
+
+    async def save_cached_user(self, user: XUser):
+        await self.save_cached_users([user])
+
+    async def save_cached_users(self, users: list[XUser]):
+        async with self.session() as session:
+            for user in users:
+                await session.merge(user)
+            await session.commit()
+
+    async def command_hashes(self) -> dict[str, str]:
+        async with self.session() as session:
+            results = await session.exec(select(CommandSync))
+            return {item.scope: item.tree_hash for item in results.all()}
+
+    async def save_command_hash(self, scope: str, tree_hash: str):
+        async with self.session() as session:
+            await session.merge(CommandSync(scope=scope, tree_hash=tree_hash))
+            await session.commit()
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import TypeAlias
+
+from discord import Embed
+from discord import File
+from discord import HTTPException
+from discord.abc import Messageable
+
+from models.config import Configuration
+from services.metrics import counter
+from services.metrics import gauge
+from services.metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+DISCORD_SEND_SECONDS = histogram("discord_send_seconds", "Latency of Discord message sends.")
+DISCORD_RATE_LIMITS = counter("discord_rate_limits_total", "Discord requests answered with 429.")
+DISCORD_SEND_ERRORS = counter("discord_send_errors_total", "Discord sends that failed for good.")
+DELIVERY_QUEUE_DEPTH = gauge("delivery_queue_depth", "Deliveries waiting in channel queues.")
+
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARACTERS = 6000
+MAX_CONTENT_CHARACTERS = 2000
+MAX_FILES_PER_MESSAGE = 10
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+
+class RateLimitCounter(logging.Filter):
+    """Counts the 429s that discord.py retries on its own, from the warning it logs for each."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.msg, str) and record.msg.startswith("We are being rate limited."):
+            DISCORD_RATE_LIMITS.inc()
+        return True
+
+
+RATE_LIMIT_COUNTER = RateLimitCounter()
+
+
+@dataclass(frozen=True, slots=True)
+class Attachment:
+    filename: str
+    path: Path
+    size: int
+    url: str
+
+
+@dataclass(slots=True)
+class Post:
+    """The embeds of one outbox entry, sent together, and the files they refer to."""
+
+    embeds: list[Embed]
+    attachments: list[Attachment] = field(default_factory=list)
+
+    @property
+    def characters(self) -> int:
+        return sum(len(embed) for embed in self.embeds)
+
+
+@dataclass(slots=True, eq=False)
+class Delivery:
+    header: str
+    posts: list[Post]
+    on_sent: Callable[[int, int], Awaitable[None]] | None = None
+    on_failed: Callable[[Exception], Awaitable[None]] | None = None
+
+
+@dataclass(slots=True)
+class Message:
+    embeds: list[Embed] = field(default_factory=list)
+    attachments: dict[str, Attachment] = field(default_factory=dict)
+    parts: list[list] = field(default_factory=list)
+    characters: int = 0
+
+    def fits(self, post: Post) -> bool:
+        # NOTE: Posts of the same account share their avatar file.
+        files = {**self.attachments, **{item.filename: item for item in post.attachments}}
+        return (
+            len(self.embeds) + len(post.embeds) <= MAX_EMBEDS_PER_MESSAGE
+            and self.characters + post.characters <= MAX_EMBED_CHARACTERS
+            and len(files) <= MAX_FILES_PER_MESSAGE
+            and sum(item.size for item in files.values()) <= MAX_UPLOAD_BYTES
+        )
+
+
+Part: TypeAlias = tuple[Delivery, int, int]
+
+
+def pack(
+    deliveries: list[Delivery],
+) -> list[tuple[str, list[Embed], list[Attachment], list[Part]]]:
+    """
+    Lays the posts of several deliveries out over as few messages as possible, keeping
+    their order and never splitting a post. Returns the content, embeds and files of every
+    message, along with the slice of each delivery's posts that it carries.
+    """
+    messages: list[Message] = []
+    for delivery in deliveries:
+        for idx, post in enumerate(delivery.posts):
+            if len(messages) == 0 or not messages[-1].fits(post):
+                messages.append(Message())
+
+            message = messages[-1]
+            if len(message.parts) == 0 or message.parts[-1][0] is not delivery:
+                message.parts.append([delivery, idx, idx])
+
+            message.parts[-1][2] = idx + 1
+            message.embeds.extend(post.embeds)
+            message.attachments.update({item.filename: item for item in post.attachments})
+            message.characters += post.characters
+
+    spans: dict[int, list[int]] = {}
+    for idx, message in enumerate(messages):
+        for delivery, _, _ in message.parts:
+            spans.setdefault(id(delivery), []).append(idx)
+
+    result = []
+    for idx, message in enumerate(messages):
+        lines = []
+        for delivery, _, _ in message.parts:
+            span = spans[id(delivery)]
+            if len(span) == 1:
+                lines.append(delivery.header)
+            else:
+                lines.append(f"{delivery.header}\nPage {span.index(idx) + 1}/{len(span)}")
+
+        parts: list[Part] = [(delivery, start, end) for delivery, start, end in message.parts]
+        content = "\n".join(lines)[:MAX_CONTENT_CHARACTERS]
+        result.append((content, message.embeds, list(message.attachments.values()), parts))
+
+    return result
+
+
+def open_files(embeds: list[Embed], attachments: list[Attachment]) -> list[File]:
+    """Opens the attached files, pointing the embeds back at the url of any evicted since."""
+    files = []
+    for item in attachments:
+        try:
+            files.append(File(item.path, filename=item.filename))
+        except FileNotFoundError:
+            reference = f"attachment://{item.filename}"
+            for embed in embeds:
+                if embed.image.url == reference:
+                    embed.set_image(url=item.url)
+                if embed.thumbnail.url == reference:
+                    embed.set_thumbnail(url=item.url)
+    return files
+
+
+class ChannelQueue:
+    def __init__(self, channel: Messageable, size: int) -> None:
+        self.channel = channel
+        self.queue: asyncio.Queue[Delivery] = asyncio.Queue(maxsize=size)
+        self.worker: asyncio.Task | None = None
+
+
+class DeliveryService:
+    """
+    One ordered queue and worker per Discord channel. Deliveries that pile up while a
+    channel is busy are packed together into messages of up to 10 embeds, 6000 characters
+    and 10 files. discord.py already waits on the rate-limit bucket of every route, so a
+    worker only backs off when a 429 still comes through.
+    """
+
+    _channels: dict[int, ChannelQueue]
+
+    def __init__(self, config: Configuration) -> None:
+        self._config = config
+        self._channels = {}
+        # NOTE: Adding the same filter again is a no-op.
+        logging.getLogger("discord.http").addFilter(RATE_LIMIT_COUNTER)
+        DELIVERY_QUEUE_DEPTH.watch("service", lambda: sum(self.depths().values()))
+
+    def depths(self) -> dict[int, int]:
+        return {key: item.queue.qsize() for key, item in self._channels.items()}
+
+    def enqueue(self, channel: Messageable, delivery: Delivery) -> bool:
+        """Queues the delivery without waiting, so a backed-up channel never holds the rest."""
+        item = self._channels.get(channel.id)
+        if item is None:
+            item = self._channels[channel.id] = ChannelQueue(
+                channel, self._config.delivery_queue_size
+            )
+
+        if item.worker is None or item.worker.done():
+            item.worker = asyncio.create_task(self._work(item), name=f"delivery:{channel.id}")
+
+        try:
+            item.queue.put_nowait(delivery)
+        except asyncio.QueueFull:
+            return False
+
+        return True
+
+    async def stop(self):
+        workers = [item.worker for item in self._channels.values() if item.worker is not None]
+        for worker in workers:
+            worker.cancel()
+
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._channels.clear()
+
+    async def _send(
+        self,
+        channel: Messageable,
+        content: str,
+        embeds: list[Embed],
+        attachments: list[Attachment],
+    ):
+        for attempt in range(self._config.delivery_max_retries + 1):
+            try:
+                with DISCORD_SEND_SECONDS.time():
+                    # NOTE: discord.py closes the files after a send, retries need new ones.
+                    files = open_files(embeds, attachments)
+                    if len(files) == 0:
+                        await channel.send(content, embeds=embeds)
+                    else:
+                        await channel.send(content, embeds=embeds, files=files)
+            except HTTPException as e:
+                if e.status != 429 or attempt == self._config.delivery_max_retries:
+                    DISCORD_SEND_ERRORS.inc()
+                    raise
+
+                retry_after = float(e.response.headers.get("Retry-After", 2**attempt))
+                logger.warning(f"[Delivery:{channel.id}] Rate limited, retry in {retry_after}s")
+                await asyncio.sleep(retry_after)
+            else:
+                return
+
+    async def _work(self, item: ChannelQueue):
+        while True:
+            try:
+                async with asyncio.timeout(self._config.delivery_idle_timeout):
+                    batch = [await item.queue.get()]
+            except TimeoutError:
+                if item.queue.empty():
+                    return
+                continue
+
+            while not item.queue.empty() and len(batch) < self._config.delivery_batch_size:
+                batch.append(item.queue.get_nowait())
+
+            # NOTE(Haze): Don't use asyncio.gather, it requires to executed sequentially.
+            delivered: set[int] = set()
+            try:
+                for content, embeds, attachments, parts in pack(batch):
+                    await self._send(item.channel, content, embeds, attachments)
+                    for delivery, start, end in parts:
+                        if end == len(delivery.posts):
+                            delivered.add(id(delivery))
+                        if delivery.on_sent is not None:
+                            await delivery.on_sent(start, end)
+            except Exception as e:
+                failed = [delivery for delivery in batch if id(delivery) not in delivered]
+                logger.exception(
+                    f"[Delivery:{item.channel.id}] Failure to deliver {len(failed)} items."
+                )
+                for delivery in failed:
+                    if delivery.on_failed is not None:
+                        await delivery.on_failed(e)
+            finally:
+                for _ in batch:
+                    item.queue.task_done()
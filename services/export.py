@@ -0,0 +1,191 @@
+import asyncio
+import gzip
+import json
+import logging
+import shutil
+import sqlite3
+from dataclasses import dataclass
+from datetime import UTC
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO
+
+from models.config import Configuration
+from services.delivery import MAX_UPLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+# NOTE: Leaves room for the multipart overhead of the upload.
+PART_BYTES = MAX_UPLOAD_BYTES - 64 * 1024
+BACKUP_PAGES = 1024
+CHUNK_BYTES = 1024 * 1024
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# NOTE: The column that moves forward whenever a row of the table changes, apart from the
+# polling cursors of the subscriptions.
+CHANGE_COLUMNS = {
+    "subscription": "updated_at",
+    "outboxentry": "updated_at",
+    "xuser": "fetched_at",
+    "commandsync": "synced_at",
+}
+
+
+class PartWriter:
+    """A write-only file that rolls over into name.001, name.002, ... every `limit` bytes."""
+
+    def __init__(self, path: Path, limit: int = PART_BYTES) -> None:
+        self.path = path
+        self.limit = limit
+        self.parts: list[Path] = []
+        self._file: BinaryIO | None = None
+        self._written = 0
+
+    def write(self, data: bytes) -> int:
+        view = memoryview(data)
+        while len(view) != 0:
+            if self._file is None or self._written >= self.limit:
+                self._roll()
+
+            size = min(len(view), self.limit - self._written)
+            self._file.write(view[:size])
+            self._written += size
+            view = view[size:]
+
+        return len(data)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _roll(self):
+        self.close()
+        path = self.path.with_name(f"{self.path.name}.{len(self.parts) + 1:03}")
+        self._file = path.open("wb")
+        self._written = 0
+        self.parts.append(path)
+
+
+@dataclass(slots=True)
+class Export:
+    directory: Path
+    parts: list[Path]
+    size: int
+    incremental: bool
+    started_at: datetime
+    since: datetime | None = None
+
+
+class ExportService:
+    """
+    Exports the database for admins without reading a file that is being written to. A full
+    export copies a consistent snapshot with SQLite's online backup API, an incremental one
+    dumps the rows changed since the last export as JSON lines. Both are gzipped and split
+    into parts that fit a Discord upload, and all file work runs in a thread.
+    """
+
+    def __init__(self, config: Configuration) -> None:
+        self._config = config
+        self._database_path = Path(config.database_path) / "tracker.db"
+        self._directory = Path(config.database_path) / "exports"
+        self._marker = self._directory / "last_export.json"
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    async def export(self, incremental: bool = False) -> Export:
+        async with self._lock:
+            return await asyncio.to_thread(self._export, incremental)
+
+    async def commit(self, export: Export):
+        """Makes the export the base of the next incremental one, once it was handed over."""
+        data = json.dumps({"exported_at": export.started_at.isoformat()})
+        await asyncio.to_thread(self._marker.write_text, data)
+
+    async def discard(self, export: Export):
+        await asyncio.to_thread(shutil.rmtree, export.directory, True)
+
+    def _export(self, incremental: bool) -> Export:
+        started_at = datetime.now(UTC)
+        directory = self._directory / started_at.strftime("%Y%m%d%H%M%S")
+        directory.mkdir(parents=True, exist_ok=True)
+
+        since = self._last_export() if incremental else None
+        if since is None:
+            name, incremental = "tracker.db.gz", False
+        else:
+            name = "tracker.changes.jsonl.gz"
+
+        writer = PartWriter(directory / name)
+        try:
+            with gzip.GzipFile(filename=name[:-3], mode="wb", fileobj=writer) as output:
+                if incremental:
+                    self._dump_changes(output, since)
+                else:
+                    self._dump_snapshot(output, directory / "snapshot.db")
+        except BaseException:
+            writer.close()
+            shutil.rmtree(directory, True)
+            raise
+        finally:
+            writer.close()
+
+        size = sum(path.stat().st_size for path in writer.parts)
+        logger.info(f"[Export] {name} written in {len(writer.parts)} parts, {size} bytes.")
+        return Export(directory, writer.parts, size, incremental, started_at, since)
+
+    def _last_export(self) -> datetime | None:
+        try:
+            return datetime.fromisoformat(json.loads(self._marker.read_text())["exported_at"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _dump_snapshot(self, output: gzip.GzipFile, snapshot: Path):
+        source = sqlite3.connect(self._database_path)
+        target = sqlite3.connect(snapshot)
+        try:
+            # NOTE: Copied in steps, so writers of the bot only ever wait for one step.
+            source.backup(target, pages=BACKUP_PAGES)
+        finally:
+            target.close()
+            source.close()
+
+        try:
+            with snapshot.open("rb") as file:
+                while chunk := file.read(CHUNK_BYTES):
+                    output.write(chunk)
+        finally:
+            snapshot.unlink(missing_ok=True)
+
+    def _dump_changes(self, output: gzip.GzipFile, since: datetime):
+        threshold = since.astimezone(UTC).strftime(TIMESTAMP_FORMAT)
+        connection = sqlite3.connect(self._database_path)
+        connection.row_factory = sqlite3.Row
+        try:
+            # NOTE: One read transaction, so every table is read from the same state.
+            connection.execute("BEGIN")
+            tables = {
+                row["name"]
+                for row in connection.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            }
+            for table, column in CHANGE_COLUMNS.items():
+                if table not in tables:
+                    continue
+
+                rows = connection.execute(
+                    f'SELECT * FROM "{table}" WHERE "{column}" IS NULL OR "{column}" > ?',  # noqa: S608
+                    (threshold,),
+                )
+                for row in rows:
+                    line = json.dumps({"table": table, "row": dict(row)}, ensure_ascii=False)
+                    output.write(line.encode() + b"\n")
+        finally:
+            connection.rollback()
+            connection.close()
@@ -0,0 +1,302 @@
+import json
+import re
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import fields
+from functools import lru_cache
+
+from models.database import Subscription
+from models.tweet import TweetRecord
+
+# NOTE: Patterns run on the event loop against every fetched tweet, so the ones that could
+# backtrack for exponential time are refused.
+MAX_PATTERN_CHARACTERS = 100
+QUANTIFIERS = "*+{"
+
+LIST_RULES = (
+    "keywords",
+    "exclude_keywords",
+    "hashtags",
+    "exclude_hashtags",
+    "patterns",
+    "exclude_patterns",
+    "languages",
+    "exclude_languages",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class FilterRules:
+    """
+    What a subscription lets through. A tweet must match one of the keywords, hashtags or
+    patterns when any is set, be in one of the languages when any is set, and match none of
+    the exclusions. Keywords and hashtags ignore case, patterns are case-insensitive regexes.
+    Keywords match anywhere in the text, `cat` matches `category` too, use a pattern such as
+    `\\bcat\\b` for whole words.
+    """
+
+    keywords: tuple[str, ...] = ()
+    exclude_keywords: tuple[str, ...] = ()
+    hashtags: tuple[str, ...] = ()
+    exclude_hashtags: tuple[str, ...] = ()
+    patterns: tuple[str, ...] = ()
+    exclude_patterns: tuple[str, ...] = ()
+    languages: tuple[str, ...] = ()
+    exclude_languages: tuple[str, ...] = ()
+    media_only: bool = False
+    ignore_replies: bool = False
+    ignore_retweets: bool = False
+
+
+def has_nested_repeat(pattern: str) -> bool:
+    """Tells whether a repeated group holds a repeat or an alternation, as in `(a?a?)+`."""
+    groups: list[bool] = []
+    idx = 0
+    while idx < len(pattern):
+        char = pattern[idx]
+        if char == "\\":
+            idx += 1
+        elif char == "[":
+            # NOTE: Character classes hold no quantifiers, a leading ] is a literal one.
+            idx += 2 if pattern[idx + 1 : idx + 2] in ("]", "^") else 1
+            while idx < len(pattern) and pattern[idx] != "]":
+                idx += 2 if pattern[idx] == "\\" else 1
+        elif char == "(":
+            groups.append(False)
+            # NOTE: The ? of an extension such as (?: or (?i) is no quantifier.
+            if pattern[idx + 1 : idx + 2] == "?":
+                idx += 1
+        elif char == ")" and len(groups) != 0:
+            risky = groups.pop()
+            repeated = pattern[idx + 1 : idx + 2] in tuple(QUANTIFIERS)
+            if risky and repeated:
+                return True
+            if len(groups) != 0:
+                groups[-1] = groups[-1] or risky or repeated
+        elif (char in QUANTIFIERS or char in "?|") and len(groups) != 0:
+            groups[-1] = True
+        idx += 1
+    return False
+
+
+def check_pattern(pattern: str):
+    if len(pattern) > MAX_PATTERN_CHARACTERS:
+        raise ValueError(f"Patterns are limited to {MAX_PATTERN_CHARACTERS} characters.")
+    if has_nested_repeat(pattern):
+        raise ValueError(
+            f"Pattern {pattern!r} repeats a group that repeats or alternates, which can "
+            "take exponential time. Use keywords, or a simpler pattern."
+        )
+
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid pattern {pattern!r}: {e}") from e
+
+
+def split_list(value: str | None) -> list[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip() != ""]
+
+
+def make_rules(data: dict) -> FilterRules:
+    """Checks the rules of a `filters` object, and normalizes their case and hashes."""
+    known = {item.name for item in fields(FilterRules)}
+    unknown = data.keys() - known
+    if len(unknown) != 0:
+        raise ValueError(f"Unknown filter rules: {', '.join(sorted(unknown))}.")
+
+    values = {}
+    for name in LIST_RULES:
+        items = data.get(name) or []
+        if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+            raise ValueError(f"The {name} filter rule must be a list of strings.")
+
+        items = [item.strip() for item in items if item.strip() != ""]
+        if name.endswith("patterns"):
+            for item in items:
+                check_pattern(item)
+        elif name.endswith("hashtags"):
+            items = [item.lstrip("#").casefold() for item in items]
+        else:
+            items = [item.casefold() for item in items]
+        values[name] = tuple(dict.fromkeys(items))
+
+    for name in ("media_only", "ignore_replies", "ignore_retweets"):
+        values[name] = bool(data.get(name, False))
+
+    return FilterRules(**values)
+
+
+def dump_filters(rules: FilterRules) -> str | None:
+    """The `filters` column of the rules, the two ignore flags have columns of their own."""
+    data = {
+        name: list(value)
+        for name, value in asdict(rules).items()
+        if name in LIST_RULES and len(value) != 0
+    }
+    if rules.media_only:
+        data["media_only"] = True
+    return json.dumps(data, ensure_ascii=False) if len(data) != 0 else None
+
+
+def normalize_filters(raw: str | None) -> str | None:
+    if raw is None or raw.strip() == "":
+        return None
+
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"Filters are not valid JSON: {e}") from e
+    if not isinstance(data, dict) or "ignore_replies" in data or "ignore_retweets" in data:
+        raise ValueError("Filters must be a JSON object of keyword, hashtag and such rules.")
+
+    return dump_filters(make_rules(data))
+
+
+@lru_cache(maxsize=4096)
+def load_rules(filters: str | None, ignore_replies: bool, ignore_retweets: bool) -> FilterRules:
+    data = json.loads(filters) if filters else {}
+    data.update(ignore_replies=ignore_replies, ignore_retweets=ignore_retweets)
+    return make_rules(data)
+
+
+def subscription_rules(subscription: Subscription) -> FilterRules:
+    return load_rules(
+        subscription.filters, subscription.ignore_replies, subscription.ignore_retweets
+    )
+
+
+@dataclass(slots=True)
+class TweetFacts:
+    text: str
+    hashtags: frozenset[str]
+    language: str | None
+    has_media: bool
+
+
+def tweet_facts(tweet: TweetRecord) -> TweetFacts:
+    # NOTE: A retweet is judged by the tweet it shares, a quote by both of its texts.
+    source = tweet.retweeted_tweet if tweet.retweeted_tweet is not None else tweet
+    text = source.full_text
+    hashtags = source.hashtags
+    if source.quote is not None:
+        text = f"{text}\n{source.quote.full_text}"
+        hashtags = (*hashtags, *source.quote.hashtags)
+
+    return TweetFacts(
+        text=text.casefold(),
+        hashtags=frozenset(item.casefold() for item in hashtags),
+        language=source.lang.casefold() if source.lang else None,
+        has_media=len(source.media_urls) != 0 or len(tweet.media_urls) != 0,
+    )
+
+
+class TweetMatcher:
+    """
+    The filter rules of every subscription of one timeline, compiled together. Each tweet
+    is scanned once by a single alternation over all the keywords and, unless nothing can
+    match, once by a single alternation over all the patterns, and the hits are then
+    checked against every subscription's rules as set lookups.
+    """
+
+    def __init__(self, rules: tuple[FilterRules, ...]) -> None:
+        self._rules = rules
+        keywords = sorted(
+            {item for rule in rules for item in (*rule.keywords, *rule.exclude_keywords)},
+            key=len,
+            reverse=True,
+        )
+        # NOTE: A lookahead reports the longest keyword at every position, the shorter ones
+        # starting there are its prefixes and are implied by it.
+        self._keywords = (
+            re.compile(f"(?=({'|'.join(re.escape(item) for item in keywords)}))")
+            if len(keywords) != 0
+            else None
+        )
+        self._implied = {
+            item: frozenset(other for other in keywords if item.startswith(other))
+            for item in keywords
+        }
+
+        patterns = sorted(
+            {item for rule in rules for item in (*rule.patterns, *rule.exclude_patterns)}
+        )
+        self._patterns = {item: re.compile(item, re.IGNORECASE) for item in patterns}
+        # NOTE: Groups would be renumbered in the alternation, such patterns are run alone.
+        self._any_pattern = None
+        if len(patterns) != 0 and all(item.groups == 0 for item in self._patterns.values()):
+            try:
+                self._any_pattern = re.compile(
+                    "|".join(f"(?:{item})" for item in patterns), re.IGNORECASE
+                )
+            except re.error:
+                self._any_pattern = None
+
+    def _keyword_hits(self, text: str) -> frozenset[str]:
+        if self._keywords is None:
+            return frozenset()
+
+        hits: set[str] = set()
+        for match in self._keywords.finditer(text):
+            hits.update(self._implied[match.group(1)])
+        return frozenset(hits)
+
+    def _pattern_hits(self, text: str) -> frozenset[str]:
+        if len(self._patterns) == 0:
+            return frozenset()
+        if self._any_pattern is not None and self._any_pattern.search(text) is None:
+            return frozenset()
+        if len(self._patterns) == 1 and self._any_pattern is not None:
+            return frozenset(self._patterns)
+
+        return frozenset(item for item, pattern in self._patterns.items() if pattern.search(text))
+
+    @staticmethod
+    def _accepts(
+        rule: FilterRules,
+        tweet: TweetRecord,
+        facts: TweetFacts,
+        keywords: frozenset[str],
+        patterns: frozenset[str],
+    ) -> bool:
+        if rule.ignore_replies and tweet.in_reply_to is not None:
+            return False
+        if rule.ignore_retweets and tweet.retweeted_tweet is not None:
+            return False
+        if rule.media_only and not facts.has_media:
+            return False
+        if len(rule.languages) != 0 and facts.language not in rule.languages:
+            return False
+        if facts.language in rule.exclude_languages:
+            return False
+        if (
+            not keywords.isdisjoint(rule.exclude_keywords)
+            or not facts.hashtags.isdisjoint(rule.exclude_hashtags)
+            or not patterns.isdisjoint(rule.exclude_patterns)
+        ):
+            return False
+        if len(rule.keywords) == 0 and len(rule.hashtags) == 0 and len(rule.patterns) == 0:
+            return True
+
+        return (
+            not keywords.isdisjoint(rule.keywords)
+            or not facts.hashtags.isdisjoint(rule.hashtags)
+            or not patterns.isdisjoint(rule.patterns)
+        )
+
+    def scan(self, tweets: list[TweetRecord]) -> list[list[TweetRecord]]:
+        """Returns, for every set of rules in order, the tweets it lets through."""
+        accepted: list[list[TweetRecord]] = [[] for _ in self._rules]
+        for tweet in tweets:
+            facts = tweet_facts(tweet)
+            keywords = self._keyword_hits(facts.text)
+            patterns = self._pattern_hits(facts.text)
+            for idx, rule in enumerate(self._rules):
+                if self._accepts(rule, tweet, facts, keywords, patterns):
+                    accepted[idx].append(tweet)
+        return accepted
+
+
+@lru_cache(maxsize=1024)
+def compile_matcher(rules: tuple[FilterRules, ...]) -> TweetMatcher:
+    return TweetMatcher(rules)
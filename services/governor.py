@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import random
+from collections.abc import Awaitable
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import monotonic
+from time import time
+from typing import TypeVar
+
+from httpx import Response
+from twikit import RequestTimeout
+from twikit import ServerError
+from twikit import TooManyRequests
+
+from exceptions import RateLimitExceededError
+from models.config import Configuration
+from services.metrics import counter
+from services.metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+X_REQUEST_SECONDS = histogram(
+    "x_request_seconds", "Latency of X API requests.", labels=("endpoint",)
+)
+X_REQUEST_ERRORS = counter(
+    "x_request_errors_total", "Failed X API requests.", labels=("endpoint", "error")
+)
+
+
+@contextmanager
+def instrument(endpoint: str):
+    try:
+        with X_REQUEST_SECONDS.time(endpoint=endpoint):
+            yield
+    except Exception as e:
+        X_REQUEST_ERRORS.inc(endpoint=endpoint, error=type(e).__name__)
+        raise
+
+
+def endpoint_of(path: str) -> str:
+    # NOTE: GraphQL paths look like /i/api/graphql/<query id>/<operation>, REST ones end in .json
+    return path.rstrip("/").rsplit("/", 1)[-1].removesuffix(".json")
+
+
+@dataclass(slots=True)
+class EndpointBudget:
+    limit: int | None = None
+    remaining: int | None = None
+    reset: float | None = None
+
+    def wait_seconds(self, now: float) -> float:
+        if self.remaining is None or self.remaining > 0 or self.reset is None:
+            return 0
+        return max(self.reset - now, 0)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int) -> None:
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+
+    @property
+    def tokens(self) -> float:
+        return min(self._capacity, self._tokens + (monotonic() - self._updated) * self._rate)
+
+    async def acquire(self):
+        self.waiting += 1
+        try:
+            async with self._lock:
+                self._tokens = self.tokens
+                self._updated = monotonic()
+                if self._tokens < 1:
+                    await asyncio.sleep((1 - self._tokens) / self._rate)
+                    self._tokens = 1
+                    self._updated = monotonic()
+
+                self._tokens -= 1
+        finally:
+            self.waiting -= 1
+
+
+class RequestGovernor:
+    """
+    Paces every request made by one X client: a token bucket spreads calls out, the
+    rate-limit headers of each response keep per-endpoint budgets up to date, and 429/5xx
+    responses are retried with jittered exponential backoff. `try_call` does not wait out a
+    rate limit, so that the account pool can hand the request to another account instead.
+    """
+
+    _budgets: dict[str, EndpointBudget]
+
+    def __init__(self, config: Configuration) -> None:
+        self._config = config
+        self._bucket = TokenBucket(config.x_requests_per_minute / 60, config.x_request_burst)
+        self._budgets = {}
+        self._waiting = 0
+
+    async def observe(self, response: Response):
+        headers = response.headers
+        if "x-rate-limit-remaining" not in headers:
+            return
+
+        budget = self._budgets.setdefault(endpoint_of(response.url.path), EndpointBudget())
+        budget.limit = int(headers.get("x-rate-limit-limit", 0)) or budget.limit
+        budget.remaining = int(headers["x-rate-limit-remaining"])
+        budget.reset = float(headers.get("x-rate-limit-reset", 0)) or budget.reset
+
+    def budget(self, endpoint: str) -> EndpointBudget:
+        return self._budgets.setdefault(endpoint, EndpointBudget())
+
+    def available(self, endpoint: str) -> bool:
+        return self.budget(endpoint).wait_seconds(time()) == 0
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self._config.x_backoff_base * 2**attempt, self._config.x_max_budget_wait)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _wait_for_budget(self, endpoint: str, patient: bool):
+        wait = self.budget(endpoint).wait_seconds(time())
+        if wait == 0:
+            return
+
+        if not patient or wait > self._config.x_max_budget_wait:
+            raise RateLimitExceededError(f"{endpoint} budget resets in {wait:.0f} seconds")
+
+        logger.info(f"[Governor:{endpoint}] Budget exhausted, waiting {wait:.1f} seconds")
+        self._waiting += 1
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            self._waiting -= 1
+
+    async def call(self, endpoint: str, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        return await self._call(endpoint, True, func, *args, **kwargs)
+
+    async def try_call(
+        self, endpoint: str, func: Callable[..., Awaitable[T]], *args, **kwargs
+    ) -> T:
+        return await self._call(endpoint, False, func, *args, **kwargs)
+
+    async def _call(
+        self, endpoint: str, patient: bool, func: Callable[..., Awaitable[T]], *args, **kwargs
+    ) -> T:
+        attempt = 0
+        while True:
+            await self._wait_for_budget(endpoint, patient)
+            await self._bucket.acquire()
+
+            try:
+                with instrument(endpoint):
+                    return await func(*args, **kwargs)
+            except TooManyRequests as e:
+                budget = self.budget(endpoint)
+                budget.remaining = 0
+                budget.reset = e.rate_limit_reset or time() + self.backoff(attempt)
+                delay = budget.wait_seconds(time())
+                if not patient:
+                    raise RateLimitExceededError(
+                        f"{endpoint} rate-limited for {delay:.0f} seconds"
+                    ) from e
+                error = e
+            except (ServerError, RequestTimeout) as e:
+                delay = self.backoff(attempt)
+                error = e
+
+            if attempt >= self._config.x_max_retries or delay > self._config.x_max_budget_wait:
+                raise error
+
+            attempt += 1
+            logger.warning(f"[Governor:{endpoint}] Retry {attempt} in {delay:.1f}s: {error}")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "tokens": self._bucket.tokens,
+            "queue_depth": self._bucket.waiting + self._waiting,
+            "budgets": {
+                endpoint: {"limit": b.limit, "remaining": b.remaining, "reset": b.reset}
+                for endpoint, b in self._budgets.items()
+            },
+        }
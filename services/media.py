@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+from collections import OrderedDict
+from dataclasses import asdict
+from dataclasses import dataclass
+from pathlib import Path
+from time import time
+from urllib.parse import urlsplit
+
+import httpx
+from discord import Embed
+
+from models.config import Configuration
+from services.delivery import Attachment
+from services.delivery import MAX_UPLOAD_BYTES
+from services.delivery import Post
+from services.metrics import counter
+from services.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = 30
+
+MEDIA_CACHE_BYTES = gauge("media_cache_bytes", "Size of the media files kept on disk.")
+MEDIA_FETCHES = counter("media_fetches_total", "Media lookups by outcome.", labels=("result",))
+
+
+@dataclass(slots=True)
+class MediaItem:
+    url: str
+    filename: str
+    size: int
+    etag: str | None = None
+    last_modified: str | None = None
+    validated_at: float = 0.0
+
+
+def media_key(url: str) -> str:
+    return hashlib.sha1(url.encode(), usedforsecurity=False).hexdigest()
+
+
+def media_filename(url: str, content_type: str | None) -> str:
+    suffix = Path(urlsplit(url).path).suffix
+    if suffix == "" and content_type is not None:
+        suffix = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+
+    return f"{media_key(url)[:16]}{suffix or '.bin'}"
+
+
+class MediaCache:
+    """
+    Downloads the images and avatars of tweets once into MEDIA_CACHE_SIZE megabytes under
+    DATABASE_PATH, so they can be attached to Discord messages instead of hotlinked from the
+    X CDN. Files are revalidated with ETag / If-Modified-Since after MEDIA_REVALIDATE_AFTER
+    seconds, the least recently used ones are removed first, and concurrent lookups of the
+    same url share one download.
+    """
+
+    _items: OrderedDict[str, MediaItem]
+    _downloads: dict[str, asyncio.Task]
+
+    def __init__(self, config: Configuration) -> None:
+        self._config = config
+        self._directory = Path(config.database_path) / "media"
+        self._max_bytes = config.media_cache_size * 1024 * 1024
+        self._semaphore = asyncio.Semaphore(config.media_concurrency)
+        self._items = OrderedDict()
+        self._downloads = {}
+        self._size = 0
+        self._loading: asyncio.Future | None = None
+        self._client: httpx.AsyncClient | None = None
+        MEDIA_CACHE_BYTES.watch("cache", lambda: self._size)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self._config.media_concurrency),
+            )
+
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def path(self, item: MediaItem) -> Path:
+        return self._directory / item.filename
+
+    def _load(self):
+        self._directory.mkdir(parents=True, exist_ok=True)
+        metadata = sorted(self._directory.glob("*.json"), key=lambda item: item.stat().st_mtime)
+        for path in metadata:
+            try:
+                item = MediaItem(**json.loads(path.read_text()))
+            except (ValueError, TypeError):
+                path.unlink(missing_ok=True)
+                continue
+
+            if not self.path(item).is_file():
+                path.unlink(missing_ok=True)
+                continue
+
+            self._items[media_key(item.url)] = item
+            self._size += item.size
+
+    def _write(self, item: MediaItem, content: bytes | None):
+        if content is not None:
+            temporary = self.path(item).with_suffix(".part")
+            temporary.write_bytes(content)
+            temporary.replace(self.path(item))
+
+        (self._directory / f"{media_key(item.url)}.json").write_text(json.dumps(asdict(item)))
+
+    def _remove(self, item: MediaItem):
+        self.path(item).unlink(missing_ok=True)
+        (self._directory / f"{media_key(item.url)}.json").unlink(missing_ok=True)
+
+    async def _store(self, key: str, item: MediaItem, content: bytes | None):
+        await asyncio.to_thread(self._write, item, content)
+        if (previous := self._items.pop(key, None)) is not None:
+            self._size -= previous.size
+
+        self._items[key] = item
+        self._size += item.size
+        evicted = []
+        while self._size > self._max_bytes and len(self._items) > 1:
+            _, oldest = self._items.popitem(last=False)
+            self._size -= oldest.size
+            evicted.append(oldest)
+
+        if len(evicted) != 0:
+            await asyncio.to_thread(lambda: [self._remove(item) for item in evicted])
+
+    async def fetch(self, url: str) -> MediaItem | None:
+        """Returns the cached file of the url, downloading or revalidating it when needed."""
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(asyncio.to_thread(self._load))
+        loading = self._loading
+        try:
+            await loading
+        except Exception:
+            # NOTE: A failed load is tried again by the next fetch, this one keeps the link.
+            if self._loading is loading:
+                logger.exception("[Media] Failure to load the cache from disk.")
+                self._loading = None
+            return None
+
+        key = media_key(url)
+        item = self._items.get(key)
+        if item is not None and time() - item.validated_at < self._config.media_revalidate_after:
+            MEDIA_FETCHES.inc(result="hit")
+            self._items.move_to_end(key)
+            return item
+
+        task = self._downloads.get(key)
+        if task is None:
+            task = self._downloads[key] = asyncio.create_task(self._download(key, url, item))
+            task.add_done_callback(lambda _: self._downloads.pop(key, None))
+
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # NOTE: The task is dropped once done, so the next post of the url tries again.
+            MEDIA_FETCHES.inc(result="error")
+            logger.exception(f"[Media] Failure to store {url}")
+            return None
+
+    async def _download(self, key: str, url: str, item: MediaItem | None) -> MediaItem | None:
+        headers = {}
+        if item is not None and item.etag is not None:
+            headers["If-None-Match"] = item.etag
+        if item is not None and item.last_modified is not None:
+            headers["If-Modified-Since"] = item.last_modified
+
+        try:
+            async with self._semaphore:
+                response = await self._get_client().get(url, headers=headers)
+
+            if response.status_code == httpx.codes.NOT_MODIFIED and item is not None:
+                MEDIA_FETCHES.inc(result="revalidated")
+                item.validated_at = time()
+                await self._store(key, item, None)
+                return item
+
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            MEDIA_FETCHES.inc(result="error")
+            logger.warning(f"[Media] Failure to fetch {url}: {e}")
+            # NOTE: A stale copy still beats a link that no longer resolves.
+            return item
+
+        if len(response.content) > MAX_UPLOAD_BYTES:
+            MEDIA_FETCHES.inc(result="oversized")
+            return None
+
+        MEDIA_FETCHES.inc(result="downloaded")
+        item = MediaItem(
+            url=url,
+            filename=media_filename(url, response.headers.get("Content-Type")),
+            size=len(response.content),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            validated_at=time(),
+        )
+        await self._store(key, item, response.content)
+        return item
+
+    async def attach(self, data: list[dict]) -> Post:
+        """
+        Builds a post from embed dicts, pointing their images and thumbnails at attached
+        copies. Images that can't be fetched, or don't fit the upload limit, stay links.
+        """
+        fields = [
+            embed[name]
+            for embed in data
+            for name in ("image", "thumbnail")
+            if isinstance(embed.get(name), dict) and embed[name].get("url", "").startswith("http")
+        ]
+        items = await asyncio.gather(*[self.fetch(field["url"]) for field in fields])
+
+        attachments: dict[str, Attachment] = {}
+        size = 0
+        for field, item in zip(fields, items, strict=True):
+            if item is None:
+                continue
+            if item.filename not in attachments:
+                if size + item.size > MAX_UPLOAD_BYTES:
+                    continue
+
+                attachments[item.filename] = Attachment(
+                    item.filename, self.path(item), item.size, item.url
+                )
+                size += item.size
+
+            field["url"] = f"attachment://{item.filename}"
+
+        return Post(
+            embeds=[Embed.from_dict(embed) for embed in data],
+            attachments=list(attachments.values()),
+        )
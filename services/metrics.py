@@ -0,0 +1,238 @@
+import asyncio
+import logging
+from abc import ABC
+from abc import abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from time import perf_counter
+from typing import TypeAlias
+from typing import TypeVar
+
+from models.config import Configuration
+
+logger = logging.getLogger(__name__)
+
+Labels: TypeAlias = tuple[str, ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+
+    return f"{{{','.join(pairs)}}}" if pairs else ""
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+
+    def _key(self, labels: dict[str, str]) -> Labels:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]: ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: Labels = ()) -> None:
+        super().__init__(name, description, labels)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Labels = ()) -> None:
+        super().__init__(name, description, labels)
+        self._values: dict[Labels, float] = {}
+        self._watchers: dict[str, Callable[[], float | dict[str, float]]] = {}
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def watch(self, name: str, func: Callable[[], float | dict[str, float]]):
+        """
+        Reads the value at scrape time. A dict maps the value of the only label. Watching
+        again under the same name replaces the previous watcher.
+        """
+        self._watchers[name] = func
+
+    def samples(self) -> Iterator[str]:
+        values = dict(self._values)
+        for watcher in self._watchers.values():
+            result = watcher()
+            if isinstance(result, dict):
+                values.update({(str(key),): value for key, value in result.items()})
+            else:
+                values[()] = result
+
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+        self._counts: dict[Labels, list[int]] = {}
+        self._sums: dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] = self._sums.get(key, 0) + value
+
+    @contextmanager
+    def time(self, **labels: str):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, counts in self._counts.items():
+            total = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts, strict=True):
+                total += count
+                labels = _format_labels(self.labels, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {total}"
+
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {self._sums[key]}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {total}"
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class MetricsRegistry:
+    _metrics: dict[str, Metric]
+
+    def __init__(self) -> None:
+        self._metrics = {}
+
+    def register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, description: str, labels: Labels = ()) -> Counter:
+    return REGISTRY.register(Counter(name, description, labels))
+
+
+def gauge(name: str, description: str, labels: Labels = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, description, labels))
+
+
+def histogram(
+    name: str, description: str, labels: Labels = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, description, labels, buckets))
+
+
+class MetricsServer:
+    """
+    Serves the registry in the Prometheus text format on METRICS_HOST:METRICS_PORT. It only
+    answers GET /metrics, and is not started at all when METRICS_PORT is 0.
+    """
+
+    _server: asyncio.Server | None
+
+    def __init__(self, config: Configuration, registry: MetricsRegistry = REGISTRY) -> None:
+        self._config = config
+        self._registry = registry
+        self._server = None
+
+    async def start(self):
+        if self._config.metrics_port == 0 or self._server is not None:
+            return
+
+        self._server = await asyncio.start_server(
+            self._handle, self._config.metrics_host, self._config.metrics_port
+        )
+        logger.info(f"[Metrics] Serving on {self._config.metrics_host}:{self._config.metrics_port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            async with asyncio.timeout(10):
+                request = await reader.readline()
+                while (await reader.readline()).strip():
+                    pass
+
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self._registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
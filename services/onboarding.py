@@ -0,0 +1,238 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from dataclasses import fields
+from typing import Literal
+from typing import TypeAlias
+from typing import get_args
+
+from discord.abc import GuildChannel
+from sqlalchemy.exc import IntegrityError
+from twikit.errors import TwitterException
+
+from exceptions import RateLimitExceededError
+from models.base import FetchType
+from models.config import Configuration
+from models.database import Subscription
+from models.database import XUser
+from models.tweet import TweetRecord
+from services.cache import TweetCache
+from services.filters import normalize_filters
+from services.registry import SubscriptionRegistry
+from services.scheduler import PollKey
+from services.scheduler import make_poll_key
+from services.x import XService
+
+logger = logging.getLogger(__name__)
+
+ExportFormat: TypeAlias = Literal["csv", "json"]
+ChannelResolver: TypeAlias = Callable[[int], GuildChannel | None]
+
+FETCH_TYPES: tuple[str, ...] = get_args(FetchType)
+
+
+@dataclass(frozen=True, slots=True)
+class SubscriptionRow:
+    username: str
+    channel_id: str
+    fetch_type: str = "Tweets"
+    ignore_replies: bool = False
+    ignore_retweets: bool = False
+    filters: str | None = None
+
+
+COLUMNS = tuple(item.name for item in fields(SubscriptionRow))
+
+
+def parse_bool(value: str | bool | None) -> bool:
+    if isinstance(value, bool):
+        return value
+
+    return str(value or "").strip().lower() in ("1", "true", "yes")
+
+
+def make_filters(value: str | dict | None, line: int) -> str | None:
+    # NOTE: JSON files may hold the filters as an object, CSV files as JSON text.
+    raw = json.dumps(value) if isinstance(value, dict) else value
+    try:
+        return normalize_filters(raw)
+    except ValueError as e:
+        raise ValueError(f"Row {line}: {e}") from e
+
+
+def make_row(data: dict, line: int) -> SubscriptionRow:
+    username = str(data.get("username") or "").strip().lstrip("@")
+    channel_id = str(data.get("channel_id") or "").strip()
+    fetch_type = str(data.get("fetch_type") or "Tweets").strip()
+    if username == "" or not channel_id.isdigit():
+        raise ValueError(f"Row {line}: username and a numeric channel_id are required.")
+    if fetch_type not in FETCH_TYPES:
+        raise ValueError(f"Row {line}: fetch_type must be one of {', '.join(FETCH_TYPES)}.")
+
+    return SubscriptionRow(
+        username=username,
+        channel_id=channel_id,
+        fetch_type=fetch_type,
+        ignore_replies=parse_bool(data.get("ignore_replies")),
+        ignore_retweets=parse_bool(data.get("ignore_retweets")),
+        filters=make_filters(data.get("filters"), line),
+    )
+
+
+def parse_rows(content: bytes, filename: str) -> list[SubscriptionRow]:
+    """Reads a CSV file with a header row, or a JSON list of objects, of subscriptions."""
+    text = content.decode("utf-8-sig")
+    if filename.lower().endswith(".json"):
+        data = json.loads(text)
+        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+            raise ValueError("The JSON file must hold a list of objects.")
+
+        return [make_row(item, idx) for idx, item in enumerate(data, start=1)]
+
+    reader = csv.DictReader(io.StringIO(text))
+    return [make_row(item, reader.line_num) for item in reader]
+
+
+def dump_rows(subscriptions: list[Subscription], export_format: ExportFormat) -> bytes:
+    rows = [
+        asdict(
+            SubscriptionRow(
+                username=item.username,
+                channel_id=str(item.channel_id),
+                fetch_type=item.fetch_type,
+                ignore_replies=item.ignore_replies,
+                ignore_retweets=item.ignore_retweets,
+                filters=item.filters,
+            )
+        )
+        for item in sorted(subscriptions, key=lambda item: (item.channel_id, item.username))
+    ]
+    if export_format == "json":
+        return json.dumps(rows, ensure_ascii=False, indent=2).encode()
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue().encode()
+
+
+@dataclass(slots=True)
+class ImportReport:
+    added: list[Subscription] = field(default_factory=list)
+    skipped: list[tuple[SubscriptionRow, str]] = field(default_factory=list)
+
+
+class OnboardingService:
+    """
+    Subscribes many accounts in one go. Users are resolved in batches, every timeline is
+    seeded once however many rows share it, and all the rows are inserted in a single
+    transaction before they are handed to the scheduler together.
+    """
+
+    def __init__(
+        self,
+        config: Configuration,
+        x: XService,
+        registry: SubscriptionRegistry,
+        cache: TweetCache,
+    ) -> None:
+        self._config = config
+        self._x_service = x
+        self._registry = registry
+        self._tweet_cache = cache
+
+    async def _seed(self, keys: list[PollKey]) -> dict[PollKey, TweetRecord | None]:
+        semaphore = asyncio.Semaphore(self._config.fetch_concurrency)
+
+        async def seed(key: PollKey) -> TweetRecord | None:
+            # NOTE: A timeline polled within the fetch interval seeds from its cached tweet.
+            latest = self._tweet_cache.latest(key)
+            if latest is not None:
+                return latest
+
+            async with semaphore:
+                try:
+                    tweets = await self._x_service.fetch_tweets(key[0], key[1])
+                except (RateLimitExceededError, TwitterException) as e:
+                    logger.warning(f"[Onboarding:@{key[0]}] Failure to seed {key[1]}: {e}")
+                    return None
+
+            return tweets[0] if len(tweets) != 0 else None
+
+        results = await asyncio.gather(*[seed(key) for key in keys])
+        return dict(zip(keys, results, strict=True))
+
+    async def import_rows(
+        self, rows: list[SubscriptionRow], resolve_channel: ChannelResolver
+    ) -> ImportReport:
+        report = ImportReport()
+        accepted: dict[tuple[str, str], tuple[SubscriptionRow, GuildChannel]] = {}
+        for row in rows:
+            key = (row.username.lower(), row.channel_id)
+            channel = resolve_channel(int(row.channel_id))
+            if channel is None:
+                report.skipped.append((row, "Unknown channel"))
+            elif key in accepted or any(
+                item.username.lower() == key[0] for item in self._registry.by_channel(key[1])
+            ):
+                report.skipped.append((row, "Already subscribed"))
+            else:
+                accepted[key] = (row, channel)
+
+        users = await self._x_service.resolve_users([row.username for row, _ in accepted.values()])
+        for key, (row, _) in list(accepted.items()):
+            user = users.get(key[0])
+            if isinstance(user, XUser):
+                continue
+
+            if user is None:
+                report.skipped.append((row, "X user not found"))
+            elif isinstance(user, RateLimitExceededError):
+                report.skipped.append((row, "X rate limit reached, retry later"))
+            else:
+                report.skipped.append((row, f"X lookup failed, retry later ({user})"))
+            del accepted[key]
+
+        seeds = await self._seed(
+            list({make_poll_key(row.username, row.fetch_type) for row, _ in accepted.values()})
+        )
+        pending: list[tuple[SubscriptionRow, Subscription]] = []
+        for row, channel in accepted.values():
+            latest = seeds[make_poll_key(row.username, row.fetch_type)]
+            subscription = Subscription(
+                username=row.username,
+                channel_id=str(channel.id),
+                guild_id=str(channel.guild.id),
+                fetch_type=row.fetch_type,
+                ignore_replies=row.ignore_replies,
+                ignore_retweets=row.ignore_retweets,
+                filters=row.filters,
+                last_tweet_id=latest.id if latest is not None else None,
+                last_tweeted_at=latest.created_at if latest is not None else None,
+            )
+            pending.append((row, subscription))
+
+        try:
+            await self._registry.add_many([subscription for _, subscription in pending])
+            report.added.extend(subscription for _, subscription in pending)
+        except IntegrityError:
+            # NOTE: A row that /subscribe added meanwhile fails the batch, each is retried alone.
+            for row, subscription in pending:
+                try:
+                    await self._registry.add(subscription)
+                except IntegrityError:
+                    report.skipped.append((row, "Already subscribed"))
+                else:
+                    report.added.append(subscription)
+
+        logger.info(
+            f"[Onboarding] {len(report.added)} subscriptions added, {len(report.skipped)} skipped."
+        )
+        return report
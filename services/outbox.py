@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+from collections.abc import Callable
+from typing import TypeAlias
+from uuid import UUID
+
+import pendulum
+from discord import Embed
+from discord.abc import Messageable
+from sqlalchemy.exc import SQLAlchemyError
+
+from models.config import Configuration
+from models.database import OutboxEntry
+from services.database import DatabaseService
+from services.delivery import Delivery
+from services.delivery import DeliveryService
+from services.delivery import Post
+from services.media import MediaCache
+from services.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+TWEETS_DELIVERED = counter("tweets_delivered_total", "Outbox entries posted to Discord.")
+OUTBOX_FAILURES = counter("outbox_failures_total", "Outbox entries that failed to post.")
+
+ChannelResolver: TypeAlias = Callable[[int], Messageable | None]
+
+
+def get_headline(username: str, count: int) -> str:
+    if count == 1:
+        return f"New Activity from @{username}"
+
+    return f"{count} New Activities from @{username}"
+
+
+def make_entry(
+    subscription_id: UUID, channel_id: str, username: str, tweet_id: str, embeds: list[Embed]
+) -> OutboxEntry:
+    return OutboxEntry(
+        subscription_id=subscription_id,
+        channel_id=str(channel_id),
+        username=username,
+        tweet_id=tweet_id,
+        payload=json.dumps([embed.to_dict() for embed in embeds], ensure_ascii=False),
+    )
+
+
+def load_payload(payload: str) -> list[dict]:
+    # NOTE: Entries written before galleries hold a single embed.
+    data = json.loads(payload)
+    return data if isinstance(data, list) else [data]
+
+
+class OutboxService:
+    """
+    Drains the outbox table into the delivery queues. Entries are marked delivered message
+    by message, failed ones are retried with exponential backoff and dead-lettered after
+    OUTBOX_MAX_ATTEMPTS, so a restart replays whatever was left without asking X again. The
+    later tweets of a subscription wait for its retries, to keep the posting order.
+    """
+
+    _in_flight: set[int]
+    _task: asyncio.Task | None
+
+    def __init__(
+        self,
+        config: Configuration,
+        db: DatabaseService,
+        delivery: DeliveryService,
+        resolve_channel: ChannelResolver,
+        media: MediaCache | None = None,
+    ) -> None:
+        self._config = config
+        self._db_service = db
+        self._delivery_service = delivery
+        self._resolve_channel = resolve_channel
+        self._media = media
+        self._in_flight = set()
+        self._task = None
+        self._wake = asyncio.Event()
+        self._purged_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="outbox")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._media is not None:
+            await self._media.close()
+
+    async def drain(self) -> int:
+        entries = await self._db_service.pending_outbox(
+            self._config.outbox_batch_size, exclude=self._in_flight
+        )
+
+        groups: dict[UUID, list[OutboxEntry]] = {}
+        for entry in entries:
+            groups.setdefault(entry.subscription_id, []).append(entry)
+
+        handed = 0
+        for group in groups.values():
+            ids = [entry.id for entry in group]
+            channel = self._resolve_channel(int(group[0].channel_id))
+            if channel is None:
+                await self._fail(ids, f"Failure to find channel: {group[0].channel_id}")
+                continue
+
+            self._in_flight.update(ids)
+            try:
+                posts = await asyncio.gather(*[self._post(entry) for entry in group])
+            except Exception as e:
+                # NOTE: A bad payload or a media failure must not leave the ids in flight.
+                logger.exception(f"[Outbox] Failure to prepare {len(ids)} entries.")
+                await self._fail(ids, str(e) or type(e).__name__)
+                continue
+
+            delivery = Delivery(
+                header=get_headline(group[0].username, len(group)),
+                posts=posts,
+                on_sent=lambda start, end, ids=ids: self._on_sent(ids[start:end]),
+                on_failed=lambda error, ids=ids: self._on_failed(ids, error),
+            )
+            if not self._delivery_service.enqueue(channel, delivery):
+                # NOTE: The channel is backed up, the entries stay pending for a later drain.
+                logger.debug(f"[Outbox] Queue of {channel.id} is full, {len(ids)} entries wait.")
+                self._in_flight.difference_update(ids)
+                continue
+
+            handed += len(ids)
+
+        return handed
+
+    async def _post(self, entry: OutboxEntry) -> Post:
+        data = load_payload(entry.payload)
+        if self._media is None:
+            return Post(embeds=[Embed.from_dict(item) for item in data])
+
+        return await self._media.attach(data)
+
+    async def _on_sent(self, ids: list[int]):
+        TWEETS_DELIVERED.inc(len(ids))
+        try:
+            await self._db_service.mark_outbox_delivered(ids)
+        except SQLAlchemyError:
+            logger.exception(f"[Outbox] Failure to mark {len(ids)} entries delivered.")
+        finally:
+            self._in_flight.difference_update(ids)
+
+    async def _on_failed(self, ids: list[int], error: Exception):
+        await self._fail([item for item in ids if item in self._in_flight], str(error))
+
+    async def _fail(self, ids: list[int], error: str):
+        OUTBOX_FAILURES.inc(len(ids))
+        try:
+            await self._db_service.mark_outbox_failed(
+                ids,
+                error,
+                retry_after=self._config.outbox_retry_after,
+                max_attempts=self._config.outbox_max_attempts,
+            )
+        except SQLAlchemyError:
+            logger.exception(f"[Outbox] Failure to mark {len(ids)} entries failed.")
+        finally:
+            self._in_flight.difference_update(ids)
+
+    async def _purge(self):
+        now = pendulum.now("UTC")
+        if now.timestamp() - self._purged_at < 3600:
+            return
+
+        self._purged_at = now.timestamp()
+        purged = await self._db_service.purge_outbox(
+            now.subtract(hours=self._config.outbox_retention)
+        )
+        if purged != 0:
+            logger.info(f"[Outbox] {purged} delivered entries purged.")
+
+    async def _run(self):
+        while True:
+            try:
+                async with asyncio.timeout(self._config.outbox_poll_interval):
+                    await self._wake.wait()
+            except TimeoutError:
+                pass
+
+            self._wake.clear()
+            try:
+                await self.drain()
+                await self._purge()
+            except Exception:
+                logger.exception("[Outbox] Failure to drain the outbox.")
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+from typing import TypeAlias
+
+from services.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_QUEUE_DEPTH = gauge(
+    "pipeline_queue_depth", "Items waiting in front of a pipeline stage.", labels=("stage",)
+)
+
+StageHandler: TypeAlias = Callable[[Any], Awaitable[Iterable[Any] | None]]
+
+
+@dataclass(slots=True)
+class Stage:
+    name: str
+    handler: StageHandler
+    concurrency: int
+    timeout: float
+    queue: asyncio.Queue[tuple[Hashable, Any]]
+
+
+class Pipeline:
+    """
+    Stages connected by bounded queues. Each stage runs a fixed number of workers, every
+    item is handled under the stage timeout, and whatever a handler returns is passed on to
+    the next stage. Items belong to a group, and a group stays busy until every item derived
+    from it has left the pipeline.
+    """
+
+    _stages: list[Stage]
+    _workers: list[asyncio.Task]
+    _pending: dict[Hashable, int]
+
+    def __init__(self) -> None:
+        self._stages = []
+        self._workers = []
+        self._pending = {}
+        PIPELINE_QUEUE_DEPTH.watch("pipeline", self.depths)
+
+    def add_stage(
+        self,
+        name: str,
+        handler: StageHandler,
+        concurrency: int = 1,
+        timeout: float = 60,
+        queue_size: int = 0,
+    ):
+        self._stages.append(
+            Stage(
+                name=name,
+                handler=handler,
+                concurrency=concurrency,
+                timeout=timeout,
+                queue=asyncio.Queue(maxsize=queue_size),
+            )
+        )
+
+    def start(self):
+        for idx, stage in enumerate(self._stages):
+            self._workers.extend(
+                asyncio.create_task(self._work(idx), name=f"pipeline:{stage.name}:{worker}")
+                for worker in range(stage.concurrency)
+            )
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    def is_busy(self, group: Hashable) -> bool:
+        return group in self._pending
+
+    def depths(self) -> dict[str, int]:
+        return {stage.name: stage.queue.qsize() for stage in self._stages}
+
+    async def submit(self, group: Hashable, item: Any):
+        self._pending[group] = self._pending.get(group, 0) + 1
+        await self._stages[0].queue.put((group, item))
+
+    def _settle(self, group: Hashable, count: int):
+        self._pending[group] += count
+        if self._pending[group] <= 0:
+            del self._pending[group]
+
+    async def _work(self, idx: int):
+        stage = self._stages[idx]
+        following = self._stages[idx + 1] if idx + 1 < len(self._stages) else None
+
+        while True:
+            group, item = await stage.queue.get()
+            outputs = []
+            try:
+                async with asyncio.timeout(stage.timeout):
+                    outputs = list(await stage.handler(item) or [])
+            except TimeoutError:
+                logger.warning(f"[Pipeline:{stage.name}] Timed out after {stage.timeout}s: {group}")
+            except asyncio.CancelledError:
+                self._settle(group, -1)
+                raise
+            except Exception:
+                logger.exception(f"[Pipeline:{stage.name}] Unhandled error: {group}")
+            finally:
+                stage.queue.task_done()
+
+            if following is None:
+                outputs = []
+
+            self._settle(group, len(outputs) - 1)
+            for output in outputs:
+                await following.queue.put((group, output))
@@ -0,0 +1,116 @@
+import logging
+from collections.abc import Callable
+from datetime import datetime
+from typing import Literal
+from typing import TypeAlias
+from uuid import UUID
+
+from exceptions import SubscriptionNotFoundError
+from models.database import OutboxEntry
+from models.database import Subscription
+from services.cursors import CursorStore
+from services.database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+RegistryEvent: TypeAlias = Literal["added", "removed"]
+RegistryListener: TypeAlias = Callable[[RegistryEvent, Subscription], None]
+
+
+class SubscriptionRegistry:
+    """
+    In-memory copy of every subscription, indexed by id and channel. Adding or
+    removing goes to SQLite first and is then announced to listeners; cursor moves are
+    applied in memory and handed to the write-behind cursor store.
+    """
+
+    _by_id: dict[UUID, Subscription]
+    _by_channel: dict[str, set[UUID]]
+    _listeners: list[RegistryListener]
+
+    def __init__(self, db: DatabaseService, cursors: CursorStore) -> None:
+        self._db_service = db
+        self._cursors = cursors
+        self._by_id = {}
+        self._by_channel = {}
+        self._listeners = []
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def listen(self, listener: RegistryListener):
+        self._listeners.append(listener)
+
+    def _notify(self, event: RegistryEvent, subscription: Subscription):
+        for listener in self._listeners:
+            listener(event, subscription)
+
+    def _index(self, subscription: Subscription):
+        self._by_id[subscription.id] = subscription
+        self._by_channel.setdefault(str(subscription.channel_id), set()).add(subscription.id)
+
+    def _unindex(self, subscription: Subscription):
+        del self._by_id[subscription.id]
+        channel_id = str(subscription.channel_id)
+        self._by_channel[channel_id].discard(subscription.id)
+        if len(self._by_channel[channel_id]) == 0:
+            del self._by_channel[channel_id]
+
+    async def load(self):
+        for subscription in await self._db_service.subscriptions():
+            self._index(subscription)
+            self._notify("added", subscription)
+
+        logger.info(f"[Registry] {len(self._by_id)} subscriptions loaded.")
+
+    def get(self, subscription_id: UUID) -> Subscription | None:
+        return self._by_id.get(subscription_id)
+
+    def all(self) -> list[Subscription]:
+        return list(self._by_id.values())
+
+    def by_channel(self, channel_id: str) -> list[Subscription]:
+        return [self._by_id[item] for item in self._by_channel.get(str(channel_id), ())]
+
+    async def add(self, subscription: Subscription):
+        await self._db_service.add_subscription(subscription)
+        self._index(subscription)
+        self._notify("added", subscription)
+
+    async def add_many(self, subscriptions: list[Subscription]):
+        """Inserts the subscriptions in one transaction, then schedules all of them."""
+        if len(subscriptions) == 0:
+            return
+
+        await self._db_service.add_subscriptions(subscriptions)
+        for subscription in subscriptions:
+            self._index(subscription)
+            self._notify("added", subscription)
+
+    async def remove(self, subscription_id: UUID):
+        subscription = self._by_id.get(subscription_id)
+        if subscription is None:
+            raise SubscriptionNotFoundError
+
+        await self._db_service.delete_subscription(subscription_id)
+        self._cursors.discard(subscription_id)
+        self._unindex(subscription)
+        self._notify("removed", subscription)
+
+    def advance(
+        self,
+        subscription_id: UUID,
+        last_tweet_id: str,
+        last_tweeted_at: datetime,
+        entries: list[OutboxEntry] | None = None,
+        activity_gap: float | None = None,
+    ):
+        subscription = self._by_id.get(subscription_id)
+        if subscription is None:
+            return
+
+        subscription.last_tweet_id = last_tweet_id
+        subscription.last_tweeted_at = last_tweeted_at
+        if activity_gap is not None:
+            subscription.activity_gap = activity_gap
+        self._cursors.put(subscription_id, last_tweet_id, last_tweeted_at, entries, activity_gap)
@@ -0,0 +1,222 @@
+import json
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
+from string import Formatter
+
+from discord import Colour
+from discord import Embed
+
+from exceptions import ConfigurationError
+from models.config import Configuration
+from models.tweet import TweetRecord
+
+DEFAULT_COLOUR = 0x1DA0F2
+DEFAULT_TITLE = "New {action} from @{screen_name}"
+DEFAULT_DESCRIPTION = "{text}"
+
+# NOTE: With every field capped, one embed stays under the 6000 characters of a message.
+MAX_TITLE_CHARACTERS = 256
+MAX_AUTHOR_CHARACTERS = 256
+MAX_DESCRIPTION_CHARACTERS = 4096
+MAX_GALLERY_IMAGES = 4
+
+FIELDS = frozenset(
+    ("action", "name", "quote_screen_name", "quote_text", "screen_name", "text", "url")
+)
+PROFILE_OPTIONS = frozenset(("colour", "description", "media", "thumbnail", "title"))
+
+
+def truncate(value: str, limit: int) -> str:
+    if len(value) <= limit:
+        return value
+
+    return f"{value[: limit - 1]}…"
+
+
+@lru_cache(maxsize=4096)
+def get_status_url(screen_name: str, tweet_id: str) -> str:
+    return f"https://x.com/{screen_name}/{tweet_id}"
+
+
+@lru_cache(maxsize=1024)
+def get_thumbnail_url(profile_image_url: str) -> str:
+    if not profile_image_url.endswith("normal.jpg"):
+        return profile_image_url
+
+    return f"{profile_image_url.removesuffix('normal.jpg')}400x400.jpg"
+
+
+def get_url(tweet: TweetRecord) -> str:
+    # NOTE: Retweets of the same original share its url.
+    target_tweet = tweet.retweeted_tweet if tweet.retweeted_tweet is not None else tweet
+    return get_status_url(target_tweet.screen_name, target_tweet.id)
+
+
+def make_context(tweet: TweetRecord) -> dict[str, str]:
+    action = "Tweet"
+    text = tweet.full_text
+    quote_screen_name = ""
+    quote_text = ""
+
+    if tweet.retweeted_tweet is not None:
+        action = "Retweet"
+    if tweet.quote is not None:
+        action = "Quote"
+        quote_screen_name = tweet.quote.screen_name
+        quote_text = tweet.quote.full_text
+        text = f"{tweet.full_text}\n\nRT @{quote_screen_name}: {quote_text}"
+
+    return {
+        "action": action,
+        "name": tweet.name,
+        "quote_screen_name": quote_screen_name,
+        "quote_text": quote_text,
+        "screen_name": tweet.screen_name,
+        "text": text,
+        "url": get_url(tweet),
+    }
+
+
+class Template:
+    """
+    A `str.format` template over the fields of `make_context`, parsed and checked once.
+    Templates without fields, or with a single bare field, skip formatting altogether.
+    """
+
+    __slots__ = ("render", "source")
+
+    render: Callable[[dict[str, str]], str]
+
+    def __init__(self, source: str) -> None:
+        try:
+            parsed = list(Formatter().parse(source))
+        except (TypeError, ValueError) as e:
+            raise ConfigurationError(f"Invalid template {source!r}: {e}") from e
+
+        names = {name for _, name, _, _ in parsed if name is not None}
+        if not names <= FIELDS:
+            raise ConfigurationError(
+                f"Unknown fields in template {source!r}: {', '.join(sorted(names - FIELDS))}"
+            )
+
+        self.source = source
+        if len(names) == 0:
+            literal = "".join(text for text, _, _, _ in parsed)
+            self.render = lambda _context: literal
+        elif len(parsed) == 1 and parsed[0][0] == "" and not parsed[0][2] and not parsed[0][3]:
+            self.render = itemgetter(parsed[0][1])
+        else:
+            self.render = source.format_map
+
+
+@dataclass(frozen=True, slots=True)
+class RenderProfile:
+    name: str
+    title: Template
+    description: Template
+    # NOTE: discord.py validates a plain int on every embed, a Colour is taken as it is.
+    colour: Colour
+    thumbnail: bool = True
+    media: bool = True
+
+    def render(self, tweet: TweetRecord) -> list[Embed]:
+        return self.render_many([tweet])[0]
+
+    def render_many(self, tweets: list[TweetRecord]) -> list[list[Embed]]:
+        # NOTE: A burst is mostly a few accounts, their author block is built once.
+        authors: dict[tuple[str, str, str], dict[str, str]] = {}
+        return [self._render(tweet, authors) for tweet in tweets]
+
+    def _render(
+        self, tweet: TweetRecord, authors: dict[tuple[str, str, str], dict[str, str]]
+    ) -> list[Embed]:
+        context = make_context(tweet)
+        embed = Embed(
+            title=truncate(self.title.render(context), MAX_TITLE_CHARACTERS),
+            description=truncate(self.description.render(context), MAX_DESCRIPTION_CHARACTERS),
+            url=context["url"],
+            colour=self.colour,
+            timestamp=tweet.created_at,
+        )
+
+        key = (tweet.screen_name, tweet.name, tweet.profile_image_url)
+        author = authors.get(key)
+        if author is None:
+            author = authors[key] = {
+                "name": truncate(f"{tweet.name} (@{tweet.screen_name})", MAX_AUTHOR_CHARACTERS),
+                "icon_url": tweet.profile_image_url,
+                "url": f"https://x.com/{tweet.screen_name}",
+            }
+        embed.set_author(**author)
+        if self.thumbnail:
+            embed.set_thumbnail(url=get_thumbnail_url(tweet.profile_image_url))
+
+        media_urls = tweet.media_urls[:MAX_GALLERY_IMAGES] if self.media else ()
+        if len(media_urls) == 0:
+            return [embed]
+
+        # NOTE: Discord merges embeds sharing a url into one gallery of up to four images.
+        embed.set_image(url=media_urls[0])
+        return [embed, *[Embed(url=embed.url).set_image(url=item) for item in media_urls[1:]]]
+
+    def summary(self, username: str, summary: str) -> Embed:
+        return Embed(
+            title=truncate(summary, MAX_TITLE_CHARACTERS),
+            description=f"See [@{username}](https://x.com/{username})'s profile for the rest.",
+            url=f"https://x.com/{username}",
+            colour=self.colour,
+        )
+
+
+def make_profile(name: str, options: dict) -> RenderProfile:
+    unknown = options.keys() - PROFILE_OPTIONS
+    if len(unknown) != 0:
+        raise ConfigurationError(f"Unknown options in profile {name}: {', '.join(sorted(unknown))}")
+
+    colour = options.get("colour", DEFAULT_COLOUR)
+    try:
+        colour = int(colour.removeprefix("#"), 16) if isinstance(colour, str) else int(colour)
+    except (TypeError, ValueError) as e:
+        raise ConfigurationError(f"Invalid colour in profile {name}: {colour!r}") from e
+
+    return RenderProfile(
+        name=name,
+        title=Template(options.get("title", DEFAULT_TITLE)),
+        description=Template(options.get("description", DEFAULT_DESCRIPTION)),
+        colour=Colour(colour),
+        thumbnail=bool(options.get("thumbnail", True)),
+        media=bool(options.get("media", True)),
+    )
+
+
+def parse_profiles(raw: str) -> dict[str, RenderProfile]:
+    try:
+        profiles = json.loads(raw)
+    except ValueError as e:
+        raise ConfigurationError(f"RENDER_PROFILES_JSON is not valid JSON: {e}") from e
+
+    if not isinstance(profiles, dict) or not all(
+        isinstance(item, dict) for item in profiles.values()
+    ):
+        raise ConfigurationError("RENDER_PROFILES_JSON must map channel ids to objects.")
+
+    return {name: make_profile(name, options) for name, options in profiles.items()}
+
+
+class Renderer:
+    """
+    Turns tweets into embeds with the profile of their channel from RENDER_PROFILES_JSON,
+    or its `default` entry. Profiles are compiled at startup, so a bad template fails then
+    and not on the first tweet, and every text field is truncated to Discord's limits.
+    """
+
+    _profiles: dict[str, RenderProfile]
+
+    def __init__(self, config: Configuration) -> None:
+        self._profiles = parse_profiles(config.render_profiles_json)
+        self._default = self._profiles.get("default") or make_profile("default", {})
+
+    def profile(self, channel_id: str) -> RenderProfile:
+        return self._profiles.get(channel_id, self._default)
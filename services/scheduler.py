@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import zlib
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Iterable
+from dataclasses import dataclass
+from time import time
+from typing import TypeAlias
+from uuid import UUID
+
+from models.config import Configuration
+from services.metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.3
+GAP_RATIO = 0.5
+
+POLL_LAG_SECONDS = histogram("poll_lag_seconds", "Delay of polls behind their scheduled tick.")
+POLL_INTERVAL_SECONDS = histogram(
+    "poll_interval_seconds",
+    "Adaptive poll intervals.",
+    buckets=(30, 60, 120, 300, 600, 900, 1800, 3600),
+)
+
+PollKey: TypeAlias = tuple[str, str]
+PollCallback: TypeAlias = Callable[[PollKey, frozenset[UUID]], Awaitable[None]]
+
+
+def make_poll_key(username: str, fetch_type: str) -> PollKey:
+    return username.lower(), fetch_type
+
+
+def update_gap(
+    gap: float | None, last_seen: float | None, times: Iterable[float]
+) -> tuple[float | None, float | None]:
+    """Folds the gaps between new tweet times into the EWMA, returns it with the newest time."""
+    for item in sorted(times):
+        if last_seen is not None and item <= last_seen:
+            continue
+
+        if last_seen is not None:
+            sample = item - last_seen
+            gap = sample if gap is None else EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * gap
+
+        last_seen = item
+
+    return gap, last_seen
+
+
+@dataclass(slots=True)
+class Activity:
+    gap: float | None = None
+    last_seen: float | None = None
+    boost_until: float = 0.0
+
+
+class PollScheduler:
+    """
+    Polls every (username, fetch_type) pair regardless of how many subscriptions share it.
+    The interval of a key follows an EWMA of the gaps between its tweets, stretched by how
+    long it has been quiet, and bounded by POLL_MIN_INTERVAL and POLL_MAX_INTERVAL. A hit
+    keeps the key at the minimum interval for POLL_BOOST_DURATION. Keys without history use
+    FETCH_INTERVAL, and the first poll of every key lands at a stable fraction of its own
+    interval, so a restart spreads the polls out instead of firing them all at once.
+    """
+
+    _jobs: dict[PollKey, asyncio.Task]
+    _members: dict[PollKey, set[UUID]]
+    _keys: dict[UUID, PollKey]
+    _activity: dict[PollKey, Activity]
+    _wakes: dict[PollKey, asyncio.Event]
+
+    def __init__(self, config: Configuration, callback: PollCallback) -> None:
+        self._period = config.fetch_interval * 60
+        self._min_interval = config.poll_min_interval
+        self._max_interval = config.poll_max_interval
+        self._boost = config.poll_boost_duration
+        self._callback = callback
+
+        self._jobs = {}
+        self._members = {}
+        self._keys = {}
+        self._activity = {}
+        self._wakes = {}
+
+    def add(
+        self,
+        subscription_id: UUID,
+        username: str,
+        fetch_type: str,
+        gap: float | None = None,
+        last_seen: float | None = None,
+    ):
+        key = make_poll_key(username, fetch_type)
+        if self._keys.get(subscription_id) == key:
+            return
+
+        self.remove(subscription_id)
+        self._keys[subscription_id] = key
+        self._members.setdefault(key, set()).add(subscription_id)
+
+        activity = self._activity.setdefault(key, Activity())
+        if activity.gap is None:
+            activity.gap = gap
+        if last_seen is not None and (activity.last_seen is None or last_seen > activity.last_seen):
+            activity.last_seen = last_seen
+
+        if key not in self._jobs:
+            self._wakes[key] = asyncio.Event()
+            self._jobs[key] = asyncio.create_task(self._run(key), name=f"poll:{key[0]}:{key[1]}")
+
+    def remove(self, subscription_id: UUID) -> bool:
+        key = self._keys.pop(subscription_id, None)
+        if key is None:
+            return False
+
+        members = self._members[key]
+        members.discard(subscription_id)
+        if len(members) == 0:
+            del self._members[key]
+            del self._activity[key]
+            del self._wakes[key]
+            self._jobs.pop(key).cancel()
+
+        return True
+
+    def stop(self):
+        for job in self._jobs.values():
+            job.cancel()
+
+        self._jobs.clear()
+        self._members.clear()
+        self._keys.clear()
+        self._activity.clear()
+        self._wakes.clear()
+
+    def observe(
+        self, key: PollKey, times: Iterable[float], continuous: bool = True
+    ) -> float | None:
+        """
+        Records the creation times of the tweets a poll found, and returns the new gap EWMA.
+        A poll that skipped part of the timeline is not continuous, so its oldest tweet is
+        not compared against the last one seen before.
+        """
+        activity = self._activity.get(key)
+        if activity is None:
+            return None
+
+        times = list(times)
+        if len(times) == 0:
+            return activity.gap
+
+        last_seen = activity.last_seen if continuous else None
+        activity.gap, newest = update_gap(activity.gap, last_seen, times)
+        activity.last_seen = max(activity.last_seen or newest, newest)
+        activity.boost_until = time() + self._boost
+        self._wakes[key].set()
+        return activity.gap
+
+    def interval(self, key: PollKey, now: float) -> float:
+        activity = self._activity.get(key)
+        if activity is None or activity.gap is None:
+            return self._period
+        if now < activity.boost_until:
+            return self._min_interval
+
+        gap = activity.gap
+        if activity.last_seen is not None:
+            gap = max(gap, now - activity.last_seen)
+
+        return min(max(gap * GAP_RATIO, self._min_interval), self._max_interval)
+
+    def offset(self, key: PollKey) -> float:
+        return zlib.crc32(f"{key[0]}:{key[1]}".encode()) / 2**32
+
+    def first_tick(self, key: PollKey, now: float) -> float:
+        return now + self.offset(key) * self.interval(key, now)
+
+    async def _wait(self, key: PollKey, polled_at: float) -> float:
+        """Sleeps until the next poll of the key is due, and returns when that was."""
+        # NOTE: Observed hits wake the key up, so that its deadline is worked out again.
+        wake = self._wakes[key]
+        while (remaining := (due := polled_at + self.interval(key, time())) - time()) > 0:
+            wake.clear()
+            try:
+                async with asyncio.timeout(remaining):
+                    await wake.wait()
+            except TimeoutError:
+                break
+
+        POLL_INTERVAL_SECONDS.observe(due - polled_at)
+        return due
+
+    async def _run(self, key: PollKey):
+        due = self.first_tick(key, time())
+        await asyncio.sleep(max(due - time(), 0))
+        while True:
+            members = self._members.get(key)
+            if not members:
+                return
+
+            polled_at = time()
+            POLL_LAG_SECONDS.observe(max(polled_at - due, 0))
+            try:
+                await self._callback(key, frozenset(members))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"[Poll:@{key[0]}] Unhandled error while polling {key[1]}")
+
+            due = await self._wait(key, polled_at)
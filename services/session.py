@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import json
+import logging
+import tempfile
+from dataclasses import asdict
+from dataclasses import dataclass
+from pathlib import Path
+from time import time
+
+from twikit import Client
+from twikit.x_client_transaction import ClientTransaction
+
+from models.config import Configuration
+
+logger = logging.getLogger(__name__)
+
+# NOTE: X rotates the keys behind the transaction id, an old state is fetched again.
+TRANSACTION_TTL = 3600
+
+
+def cookie_digest(cookies: dict) -> str:
+    return hashlib.sha256(json.dumps(cookies, sort_keys=True).encode()).hexdigest()
+
+
+def read_cookies(client: Client) -> dict[str, str]:
+    # NOTE: Cookies X rotates land next to the seed ones under their own domain, and win.
+    jar = sorted(client.http.cookies.jar, key=lambda cookie: cookie.domain != "")
+    return {cookie.name: cookie.value for cookie in jar if cookie.value is not None}
+
+
+@dataclass(slots=True)
+class Session:
+    seed: str
+    cookies: dict[str, str]
+    transaction: dict | None = None
+    saved_at: float = 0.0
+
+
+def capture_transaction(client: Client) -> dict | None:
+    transaction = client.client_transaction
+    if not transaction.home_page_response:
+        return None
+
+    return {
+        "key": transaction.key,
+        "animation_key": transaction.animation_key,
+        "row_index": transaction.DEFAULT_ROW_INDEX,
+        "key_bytes_indices": transaction.DEFAULT_KEY_BYTES_INDICES,
+        "saved_at": time(),
+    }
+
+
+def restore_transaction(client: Client, state: dict):
+    transaction = client.client_transaction
+    transaction.key = state["key"]
+    transaction.key_bytes = transaction.get_key_bytes(state["key"])
+    transaction.animation_key = state["animation_key"]
+    transaction.DEFAULT_ROW_INDEX = state["row_index"]
+    transaction.DEFAULT_KEY_BYTES_INDICES = state["key_bytes_indices"]
+    # NOTE: twikit only looks at this to decide whether to fetch the home page again.
+    transaction.home_page_response = True
+
+
+class SessionStore:
+    """
+    Keeps the cookies and transaction-id state of every X client under DATABASE_PATH, so
+    a restart carries on with the session twikit last had instead of the X_COOKIES_JSON
+    seed. A saved session is only used while its seed is still the configured one, and
+    files are rewritten only when the session actually changed.
+    """
+
+    _saved: dict[str, Session]
+
+    def __init__(self, config: Configuration) -> None:
+        self._config = config
+        self._directory = Path(config.database_path) / "sessions"
+        self._saved = {}
+
+    def _path(self, name: str) -> Path:
+        return self._directory / f"{name}.json"
+
+    def _read(self, name: str) -> Session | None:
+        try:
+            return Session(**json.loads(self._path(name).read_text()))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _write(self, name: str, session: Session):
+        self._directory.mkdir(parents=True, exist_ok=True)
+        # NOTE: A temporary file of its own, so that a concurrent writer never shares it.
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self._directory, prefix=f"{name}.", suffix=".part", delete=False
+        ) as temporary:
+            temporary.write(json.dumps(asdict(session)))
+        Path(temporary.name).replace(self._path(name))
+
+    def restore(self, name: str, client: Client, seed: dict) -> bool:
+        """Loads the saved session into the client, or the seed. Returns which one it was."""
+        session = self._read(name)
+        if session is None or session.seed != cookie_digest(seed):
+            client.set_cookies(seed, clear_cookies=True)
+            self._saved[name] = Session(seed=cookie_digest(seed), cookies=dict(seed))
+            return False
+
+        client.set_cookies(session.cookies, clear_cookies=True)
+        transaction = session.transaction
+        if transaction is not None and time() - transaction["saved_at"] < TRANSACTION_TTL:
+            restore_transaction(client, transaction)
+
+        self._saved[name] = session
+        logger.info(f"[Session:{name}] Restored the session saved at {session.saved_at:.0f}.")
+        return True
+
+    async def reset(self, name: str, client: Client, seed: dict, forget: bool = True):
+        """Goes back to the seed cookies, and drops the saved session unless told otherwise."""
+        client.set_cookies(seed, clear_cookies=True)
+        client.client_transaction = ClientTransaction()
+        self._saved[name] = Session(seed=cookie_digest(seed), cookies=dict(seed))
+        if forget:
+            await asyncio.to_thread(self._path(name).unlink, True)
+        logger.warning(f"[Session:{name}] Saved session dropped, using X_COOKIES_JSON again.")
+
+    async def save(self, name: str, client: Client):
+        previous = self._saved.get(name)
+        if previous is None:
+            return
+
+        cookies = read_cookies(client)
+        transaction = capture_transaction(client)
+        key = transaction["key"] if transaction is not None else None
+        previous_key = previous.transaction["key"] if previous.transaction is not None else None
+        if cookies == previous.cookies and key in (None, previous_key):
+            return
+
+        session = Session(
+            seed=previous.seed,
+            cookies=dict(cookies),
+            transaction=transaction or previous.transaction,
+            saved_at=time(),
+        )
+        self._saved[name] = session
+        await asyncio.to_thread(self._write, name, session)
+        logger.debug(f"[Session:{name}] Session saved.")
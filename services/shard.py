@@ -0,0 +1,186 @@
+import asyncio
+import itertools
+import json
+import logging
+import sys
+import zlib
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+
+from exceptions import WorkerLostError
+from models.config import Configuration
+from services.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS = 64
+RESPAWN_DELAY = 5
+ROOT = Path(__file__).resolve().parents[1]
+
+SHARD_WORKERS_ALIVE = gauge("shard_workers_alive", "Worker processes connected to the bot.")
+
+
+def partition_of(username: str) -> int:
+    return zlib.crc32(username.lower().encode()) % PARTITIONS
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, ensure_ascii=False).encode() + b"\n"
+
+
+def share_budget(config: Configuration) -> Configuration:
+    """The configuration of one process, the bot and every worker share the X budget evenly."""
+    if config.shard_workers == 0:
+        return config
+
+    share = max(config.x_requests_per_minute // (config.shard_workers + 1), 1)
+    return config.model_copy(update={"x_requests_per_minute": share})
+
+
+def owner_of(partition: int, workers: list[int]) -> int:
+    # NOTE: Rendezvous hashing, losing a worker only moves the partitions it owned.
+    return max(workers, key=lambda worker: zlib.crc32(f"{partition}:{worker}".encode()))
+
+
+@dataclass(slots=True, eq=False)
+class WorkerHandle:
+    index: int
+    process: asyncio.subprocess.Process | None = None
+    writer: asyncio.StreamWriter | None = None
+    pending: dict[int, asyncio.Future] = field(default_factory=dict)
+
+    @property
+    def is_connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+
+class ShardCoordinator:
+    """
+    Runs SHARD_WORKERS worker processes and hands them poll jobs over a local socket.
+    Usernames are hashed into partitions, and every partition belongs to one connected
+    worker. A worker that dies fails its jobs, its partitions move to the others, and it is
+    started again after a short delay.
+    """
+
+    _workers: dict[int, WorkerHandle]
+    _supervisors: list[asyncio.Task]
+
+    def __init__(self, config: Configuration) -> None:
+        self._config = config
+        self._path = Path(config.database_path) / "shard.sock"
+        self._workers = {index: WorkerHandle(index) for index in range(config.shard_workers)}
+        self._supervisors = []
+        self._server: asyncio.Server | None = None
+        self._ids = itertools.count()
+        SHARD_WORKERS_ALIVE.watch("coordinator", lambda: len(self.connected()))
+
+    def connected(self) -> list[int]:
+        return sorted(index for index, item in self._workers.items() if item.is_connected)
+
+    def assignments(self) -> dict[int, int]:
+        workers = self.connected()
+        if len(workers) == 0:
+            return {}
+
+        return {partition: owner_of(partition, workers) for partition in range(PARTITIONS)}
+
+    async def start(self):
+        if self._server is not None:
+            return
+
+        self._path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(
+            self._handle, path=str(self._path), limit=2**24
+        )
+        self._supervisors = [
+            asyncio.create_task(self._supervise(worker), name=f"shard:{worker.index}")
+            for worker in self._workers.values()
+        ]
+
+    async def stop(self):
+        for task in self._supervisors:
+            task.cancel()
+        await asyncio.gather(*self._supervisors, return_exceptions=True)
+        self._supervisors.clear()
+
+        for worker in self._workers.values():
+            if worker.is_connected:
+                worker.writer.write(encode({"type": "stop"}))
+                worker.writer.close()
+            if worker.process is not None and worker.process.returncode is None:
+                worker.process.terminate()
+                await worker.process.wait()
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            self._path.unlink(missing_ok=True)
+
+    async def request(self, username: str, job: dict) -> dict:
+        # NOTE: A job whose worker is lost before it answers moves to the next owner.
+        for _ in range(len(self._workers)):
+            workers = self.connected()
+            if len(workers) == 0:
+                break
+
+            worker = self._workers[owner_of(partition_of(username), workers)]
+            writer = worker.writer
+            job_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            worker.pending[job_id] = future
+            try:
+                writer.write(encode({"type": "poll", "id": job_id, **job}))
+                await writer.drain()
+                return await future
+            except ConnectionError as e:
+                worker.pending.pop(job_id, None)
+                if worker.writer is writer:
+                    self._lose(worker, f"Worker {worker.index} disconnected: {e}")
+            except WorkerLostError as e:
+                logger.warning(f"[Shard:{worker.index}] Job for @{username} moved: {e}")
+            finally:
+                worker.pending.pop(job_id, None)
+
+        raise WorkerLostError("No shard worker is connected")
+
+    async def _supervise(self, worker: WorkerHandle):
+        while True:
+            worker.process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "worker", str(worker.index), str(self._path), cwd=ROOT
+            )
+            logger.info(f"[Shard:{worker.index}] Worker started, pid {worker.process.pid}")
+            code = await worker.process.wait()
+            logger.warning(f"[Shard:{worker.index}] Worker exited with {code}, restarting.")
+            self._lose(worker, f"Worker {worker.index} exited with {code}")
+            await asyncio.sleep(RESPAWN_DELAY)
+
+    def _lose(self, worker: WorkerHandle, reason: str):
+        if worker.writer is not None:
+            worker.writer.close()
+            worker.writer = None
+
+        for future in worker.pending.values():
+            if not future.done():
+                future.set_exception(WorkerLostError(reason))
+        worker.pending.clear()
+        logger.info(f"[Shard] Partitions rebalanced over workers {self.connected()}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        hello = json.loads(await reader.readline() or b"{}")
+        worker = self._workers.get(hello.get("worker"))
+        if hello.get("type") != "hello" or worker is None:
+            writer.close()
+            return
+
+        worker.writer = writer
+        logger.info(f"[Shard] Partitions rebalanced over workers {self.connected()}")
+        while line := await reader.readline():
+            message = json.loads(line)
+            future = worker.pending.get(message.get("id"))
+            if future is not None and not future.done():
+                future.set_result(message)
+
+        if worker.writer is writer:
+            self._lose(worker, f"Worker {worker.index} disconnected")
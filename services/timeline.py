@@ -0,0 +1,91 @@
+from bisect import insort
+from collections.abc import Sequence
+from datetime import datetime
+
+from models.tweet import TweetRecord
+
+TWITTER_EPOCH_MS = 1288834974657
+
+
+def snowflake_bound(last_id: str | None = None, last_time: datetime | None = None) -> int | None:
+    """
+    The highest tweet id that is already covered by the cursor. Tweet ids are snowflakes
+    whose upper bits are the creation time, so a time cursor maps onto the last id that
+    could have been created within its second.
+    """
+    if last_id is not None:
+        return int(last_id)
+
+    if last_time is not None:
+        next_second_ms = (int(last_time.timestamp()) + 1) * 1000
+        return ((next_second_ms - TWITTER_EPOCH_MS) << 22) - 1
+
+    return None
+
+
+def _descending(tweet: TweetRecord) -> int:
+    return -int(tweet.id)
+
+
+class TimelineAccumulator:
+    """
+    Collects timeline pages newest first and stops at the first tweet that the cursor
+    already covers. Pinned tweets show up out of order at the top of the first page, so
+    they are placed by id instead of ending the fetch. The collected tweets can be taken
+    after every page, so that a long timeline is never held in memory at once.
+    """
+
+    _ordered: list[TweetRecord]
+    _out_of_order: list[TweetRecord]
+
+    def __init__(self, since: int | None = None) -> None:
+        self.since = since
+        self.pages = 0
+        self._ordered = []
+        self._out_of_order = []
+        self._seen: set[str] = set()
+        self._lowest: int | None = None
+
+    def take(self) -> list[TweetRecord]:
+        """Returns the tweets consumed since the last call, newest first."""
+        result, self._ordered = self._ordered, []
+        for tweet in self._out_of_order:
+            insort(result, tweet, key=_descending)
+
+        self._out_of_order = []
+        return result
+
+    def _is_new(self, tweet_id: int) -> bool:
+        return self.since is None or tweet_id > self.since
+
+    def _place(self, tweet: TweetRecord, tweet_id: int):
+        if tweet.id in self._seen or not self._is_new(tweet_id):
+            return
+
+        self._seen.add(tweet.id)
+        self._out_of_order.append(tweet)
+
+    def consume(self, page: Sequence[TweetRecord]) -> bool:
+        """Returns True once the cursor has been reached and no more pages are needed."""
+        self.pages += 1
+        ids = [int(tweet.id) for tweet in page]
+
+        start = 0
+        if self.pages == 1 and len(ids) >= 2 and ids[0] < ids[1]:
+            self._place(page[0], ids[0])
+            start = 1
+
+        for tweet, tweet_id in zip(page[start:], ids[start:], strict=True):
+            if self._lowest is not None and tweet_id > self._lowest:
+                self._place(tweet, tweet_id)
+                continue
+
+            if not self._is_new(tweet_id):
+                return True
+
+            self._lowest = tweet_id
+            if tweet.id not in self._seen:
+                self._seen.add(tweet.id)
+                self._ordered.append(tweet)
+
+        return self.since is None
@@ -1,16 +1,28 @@
-import json
 import logging
+from asyncio import Semaphore
+from asyncio import gather
 from asyncio import sleep
+from collections.abc import AsyncIterator
 from typing import TYPE_CHECKING
 
 import pendulum
-from twikit import Client
-from twikit import Tweet
-from twikit import User
 from twikit import UserNotFound
 from twikit import UserUnavailable
+from twikit.errors import TwitterException
 
+from exceptions import RateLimitExceededError
 from models.config import Configuration
+from models.database import XUser
+from models.tweet import TweetRecord
+from services.accounts import AccountPool
+from services.cache import TweetCache
+from services.database import DatabaseService
+from services.metrics import COUNT_BUCKETS
+from services.metrics import counter
+from services.metrics import histogram
+from services.scheduler import make_poll_key
+from services.timeline import TimelineAccumulator
+from services.timeline import snowflake_bound
 
 if TYPE_CHECKING:
     from pendulum import DateTime
@@ -19,89 +31,195 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+X_PAGES_PER_POLL = histogram(
+    "x_pages_per_poll", "Timeline pages fetched per poll.", ("fetch_type",), COUNT_BUCKETS
+)
+X_TWEETS_FETCHED = counter(
+    "x_tweets_fetched_total", "New tweets found on timelines.", labels=("fetch_type",)
+)
+
+TIMELINE_ENDPOINTS = {
+    "Tweets": "UserTweets",
+    "Replies": "UserTweetsAndReplies",
+    "Media": "UserMedia",
+    "Likes": "Likes",
+}
+
 
 class XService:
-    def __init__(self, config: Configuration) -> None:
+    _users: dict[str, XUser]
+    _resolved: list[XUser]
+
+    def __init__(
+        self,
+        config: Configuration,
+        db: DatabaseService,
+        cache: TweetCache,
+        save_users: bool = True,
+        shard: int | None = None,
+    ) -> None:
         self._config = config
-        self._client = Client(language="ja-JP")
-        self._client.set_cookies(json.loads(self._config.x_cookies_json), clear_cookies=True)
+        self._db_service = db
+        self._cache = cache
+        self._save_users = save_users
+        self._users = {}
+        self._resolved = []
+        self._pool = AccountPool(config, shard)
+
+    def _is_fresh(self, user: XUser) -> bool:
+        age = pendulum.now("UTC") - pendulum.instance(user.fetched_at)
+        return age.total_seconds() < self._config.user_cache_ttl
+
+    async def resolve_user(self, username: str) -> XUser | None:
+        screen_name = username.lower()
+        user = self._users.get(screen_name)
+        if user is None:
+            user = await self._db_service.get_cached_user(screen_name)
+
+        if user is not None and self._is_fresh(user):
+            self._users[screen_name] = user
+            return user
 
-    async def check_user_exists(self, username: str) -> User | None:
         try:
-            return await self._client.get_user_by_screen_name(username)
+            fetched = await self._pool.call(
+                screen_name,
+                "UserByScreenName",
+                lambda client: client.get_user_by_screen_name(username),
+            )
         except (UserNotFound, UserUnavailable):
             return None
 
+        user = XUser(
+            screen_name=screen_name,
+            user_id=fetched.id,
+            name=fetched.name,
+            profile_image_url=fetched.profile_image_url,
+        )
+        if self._save_users:
+            await self._db_service.save_cached_user(user)
+        else:
+            # NOTE: Shard workers only read the database, the bot process saves these.
+            self._resolved.append(user)
+        self._users[screen_name] = user
+        return user
+
+    def take_resolved(self) -> list[XUser]:
+        """Returns the users fetched from X since the last call, when they are not saved."""
+        resolved, self._resolved = self._resolved, []
+        return resolved
+
+    async def resolve_users(
+        self, usernames: list[str]
+    ) -> dict[str, XUser | RateLimitExceededError | TwitterException | None]:
+        """
+        Resolves many users at once, reading the cached ones in one query and asking X for
+        the rest, at most FETCH_CONCURRENCY at a time within the request budget. Users that
+        don't exist map to None, lookups that failed map to their error.
+        """
+        screen_names = list(dict.fromkeys(item.lower() for item in usernames))
+        missing = [item for item in screen_names if item not in self._users]
+        for user in await self._db_service.get_cached_users(missing):
+            if self._is_fresh(user):
+                self._users[user.screen_name] = user
+
+        semaphore = Semaphore(self._config.fetch_concurrency)
+
+        async def resolve(
+            screen_name: str,
+        ) -> XUser | RateLimitExceededError | TwitterException | None:
+            async with semaphore:
+                try:
+                    return await self.resolve_user(screen_name)
+                except (RateLimitExceededError, TwitterException) as e:
+                    logger.warning(f"[Resolve:@{screen_name}] Failure to resolve: {e}")
+                    return e
+
+        users = await gather(*[resolve(item) for item in screen_names])
+        return dict(zip(screen_names, users, strict=True))
+
+    async def check_user_exists(self, username: str) -> XUser | None:
+        return await self.resolve_user(username)
+
+    def start(self):
+        self._pool.start()
+
+    async def stop(self):
+        await self._pool.stop()
+
     async def fetch_tweets(
         self,
         username: str,
         fetch_type: "FetchType",
         last_id: str | None = None,
         last_time: "DateTime | None" = None,
-    ) -> list[Tweet]:
-        logger.info(f"[Fetch:@{username}] {fetch_type}, Id - {last_id}, Time - {last_time}")
-        if last_time is not None:
-            last_time = pendulum.instance(last_time)
+    ) -> list[TweetRecord]:
+        tweets = []
+        async for page in self.stream_tweets(username, fetch_type, last_id, last_time):
+            tweets.extend(page)
 
-        results: list[Tweet] = []
-        user = await self._client.get_user_by_screen_name(username)
-        tweets = await user.get_tweets(fetch_type, count=1 if last_id is None else 40)
-        results.extend(tweets)
+        return tweets
 
+    async def stream_tweets(
+        self,
+        username: str,
+        fetch_type: "FetchType",
+        last_id: str | None = None,
+        last_time: "DateTime | None" = None,
+    ) -> AsyncIterator[list[TweetRecord]]:
+        """Yields the tweets newer than the cursor page by page, newest first."""
+        logger.info(f"[Fetch:@{username}] {fetch_type}, Id - {last_id}, Time - {last_time}")
+        user = await self.resolve_user(username)
+        if user is None:
+            raise UserNotFound(f"Failed to resolve @{username}")
+
+        endpoint = TIMELINE_ENDPOINTS[fetch_type]
+        timeline = TimelineAccumulator(since=snowflake_bound(last_id, last_time))
+        # NOTE: Seeding asks for a few tweets, so that a pinned tweet can be told apart.
+        count = 5 if timeline.since is None else 40
+        tweets = await self._pool.call(
+            user.screen_name,
+            endpoint,
+            lambda client: client.get_user_tweets(user.user_id, fetch_type, count=count),
+        )
         logger.info(f"[Fetch:@{username}]: {len(tweets)} Tweets")
-        fetch_pages = 1
-
-        if last_id is not None or last_time is not None:
-            while fetch_pages != -1:
-                if last_id is not None and last_id in [tweet.id for tweet in tweets]:
-                    fetch_pages = -1
-                    break
-
-                if last_time is not None and any(
-                    last_time.diff(tweet.created_at_datetime, abs=False).total_seconds() < 0
-                    for tweet in tweets
-                ):
-                    fetch_pages = -1
-                    break
-
-                fetch_pages += 1
-                await sleep(self._config.fetch_page_interval)
 
-                logger.info(f"[Fetch:@{username}] Get {fetch_pages} Page")
-                user = await self._client.get_user_by_screen_name(username)
-                tweets = await tweets.next()
-                if len(tweets) == 0:
-                    break
+        key = make_poll_key(username, fetch_type)
+        try:
+            while True:
+                done = timeline.consume([TweetRecord.from_tweet(tweet) for tweet in tweets])
+                page = timeline.take()
+                self._cache.remember(key, page)
+                if len(page) != 0:
+                    X_TWEETS_FETCHED.inc(len(page), fetch_type=fetch_type)
+                    yield page
 
-                results.extend(tweets)
+                if done:
+                    return
 
-        return self._sort_and_trim(results, last_id, last_time)
+                await sleep(self._config.fetch_page_interval)
 
-    @staticmethod
-    def filter(tweets: list[Tweet], ignore_replies: bool = False, ignore_retweets: bool = False):
-        return list(
-            filter(
-                lambda tweet: not (
-                    (ignore_replies and tweet.in_reply_to is not None)
-                    or (ignore_retweets and tweet.retweeted_tweet is not None)
-                ),
-                tweets,
-            )
-        )
+                logger.info(f"[Fetch:@{username}] Get {timeline.pages + 1} Page")
+                # NOTE: Page by cursor, so that a page can be fetched by another account.
+                tweets = await self._pool.call(
+                    user.screen_name,
+                    endpoint,
+                    lambda client, cursor=tweets.next_cursor: client.get_user_tweets(
+                        user.user_id, fetch_type, count=count, cursor=cursor
+                    ),
+                )
+                if len(tweets) == 0:
+                    return
+        finally:
+            X_PAGES_PER_POLL.observe(timeline.pages, fetch_type=fetch_type)
 
     @staticmethod
-    def _sort_and_trim(
-        tweets: list[Tweet], last_id: str | None = None, last_time: "DateTime | None" = None
-    ) -> list[Tweet]:
-        result = sorted(tweets, key=lambda x: x.created_at_datetime, reverse=True)
-        if last_id is None and last_time is None:
-            return result
-
-        for idx, tweet in enumerate(result):
-            if tweet.id == last_id:
-                return result[0:idx]
-
-        if last_time is not None:
-            return list(filter(lambda tweet: tweet.created_at_datetime > last_time, tweets))
+    def newer_than(
+        tweets: list[TweetRecord],
+        last_id: str | None = None,
+        last_time: "DateTime | None" = None,
+    ) -> list[TweetRecord]:
+        since = snowflake_bound(last_id, last_time)
+        if since is None:
+            return tweets
 
-        return result
+        return [tweet for tweet in tweets if int(tweet.id) > since]
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+import sys
+
+from actions.subscribe import collect_backlogs
+from actions.subscribe import render_entries
+from exceptions import RateLimitExceededError
+from models.config import Configuration
+from models.config import read_config
+from models.database import Subscription
+from services.cache import TweetCache
+from services.database import DatabaseService
+from services.renderer import Renderer
+from services.shard import encode
+from services.shard import share_budget
+from services.x import XService
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s [%(name)s:%(lineno)s] %(message)s",
+    handlers=[logging.StreamHandler(stream=sys.stdout)],
+)
+log = logging.getLogger("worker")
+for item in [logging.getLogger("httpx"), logging.getLogger("httpcore")]:
+    item.setLevel(logging.WARNING)
+
+
+def take_users(x: XService) -> list[dict]:
+    return [user.model_dump(mode="json") for user in x.take_resolved()]
+
+
+async def poll(
+    x: XService, config: Configuration, cache: TweetCache, renderer: Renderer, message: dict
+) -> dict:
+    subscriptions = [Subscription.model_validate(item) for item in message["subscriptions"]]
+    try:
+        backlogs, latest, times = await collect_backlogs(x, config, subscriptions)
+    except RateLimitExceededError as e:
+        return {"id": message["id"], "error": str(e), "users": take_users(x)}
+
+    if latest is None:
+        return {"id": message["id"], "latest": None, "users": take_users(x)}
+
+    return {
+        "id": message["id"],
+        "users": take_users(x),
+        "latest": {"id": latest.id, "created_at": latest.created_at.isoformat()},
+        "times": times,
+        "continuous": all(backlog.complete for backlog in backlogs),
+        "deliveries": [
+            {
+                "subscription_id": str(backlog.subscription.id),
+                "entries": [
+                    {
+                        "channel_id": entry.channel_id,
+                        "username": entry.username,
+                        "tweet_id": entry.tweet_id,
+                        "payload": entry.payload,
+                    }
+                    for entry in render_entries(cache, renderer, backlog, config.catchup_summary)
+                ],
+            }
+            for backlog in backlogs
+        ],
+    }
+
+
+async def run(index: int, path: str):
+    # NOTE: Every worker polls with its own share of the X request budget.
+    config = share_budget(read_config())
+    db = DatabaseService(config)
+    cache = TweetCache(config)
+    renderer = Renderer(config)
+    x = XService(config, db, cache, save_users=False, shard=index)
+    semaphore = asyncio.Semaphore(config.fetch_concurrency)
+    tasks: set[asyncio.Task] = set()
+
+    reader, writer = await asyncio.open_unix_connection(path, limit=2**24)
+    writer.write(encode({"type": "hello", "worker": index}))
+    await writer.drain()
+    log.info(f"[Worker:{index}] Connected to {path}")
+
+    async def handle(message: dict):
+        async with semaphore:
+            try:
+                result = await poll(x, config, cache, renderer, message)
+            except Exception as e:
+                log.exception(f"[Worker:{index}] Failure to poll job {message['id']}")
+                result = {"id": message["id"], "error": str(e) or type(e).__name__}
+
+        writer.write(encode(result))
+        await writer.drain()
+
+    try:
+        while line := await reader.readline():
+            message = json.loads(line)
+            if message.get("type") == "stop":
+                break
+            if message.get("type") == "poll":
+                task = asyncio.create_task(handle(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        writer.close()
+        log.info(f"[Worker:{index}] Stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]), sys.argv[2]))